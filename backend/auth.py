@@ -1,27 +1,29 @@
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from .database import SessionLocal
+from .database import AnySession, get_db, run_db
 from .models import User
 
 SECRET_KEY = "climate-service-secret-key-2024-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+# Кэш пользователей по sub из токена: время жизни записи (с) и размер
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return plain_password == hashed_password
 
@@ -35,7 +37,83 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+class Principal(NamedTuple):
+    """Аутентифицированный пользователь: всё, что нужно для проверки прав"""
+    user_id: int
+    user_type: str
+    fio: str
+
+class PrincipalCache:
+    """Потокобезопасный LRU-кэш с ограниченным временем жизни записей"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+def invalidate_principal(user_id: int):
+    """Сбросить кэш пользователя (удаление, смена роли или ФИО)"""
+    principal_cache.invalidate(str(user_id))
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    invalidate_principal(target.user_id)
+
+def _load_user(db: Session, user_id: int):
+    return db.query(User).filter(User.user_id == user_id).first()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AnySession = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Неавторизовано: неверный токен",
@@ -49,13 +127,23 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.user_id == int(user_id)).first()
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    
+    try:
+        uid = int(user_id)
+    except ValueError:
+        raise credentials_exception
+    user = await run_db(db, _load_user, uid)
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal(user_id=user.user_id, user_type=user.user_type, fio=user.fio)
+    principal_cache.put(user_id, principal)
+    return principal
 
 def require_roles(*allowed_roles: str):
-    def checker(current_user: User = Depends(get_current_user)):
+    async def checker(current_user: Principal = Depends(get_current_user)):
         if current_user.user_type not in allowed_roles:
             raise HTTPException(
                 status_code=403, 
@@ -0,0 +1,96 @@
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Response
+
+# Условные GET: ETag строится по (id, version) строк, поэтому ответ 304
+# отдаётся до сериализации. Для одной строки дополнительно Last-Modified.
+
+def _utc(dt):
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+def http_date(dt) -> str:
+    return format_datetime(_utc(dt), usegmt=True)
+
+def row_etag(kind: str, row_id: int, version: int) -> str:
+    return f'"{kind}-{row_id}-v{version}"'
+
+def list_etag(kind: str, versions, extra: str = "") -> str:
+    """ETag страницы: набор и порядок строк, их версии и курсор следующей страницы"""
+    digest = hashlib.sha1(kind.encode())
+    for row_id, version in versions:
+        digest.update(f"{row_id}:{version},".encode())
+    digest.update(extra.encode())
+    return f'"{kind}-list-{digest.hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение, как требует RFC 9110 для If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return etag in [t[2:] if t.startswith("W/") else t for t in tags]
+
+def not_modified_since(if_modified_since: Optional[str], last_modified) -> bool:
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # В HTTP-дате нет долей секунды
+    return _utc(last_modified).replace(microsecond=0) <= _utc(since)
+
+def conditional(response: Response, etag: str, last_modified=None,
+                if_none_match: Optional[str] = None, if_modified_since: Optional[str] = None):
+    """
+    Проставить валидаторы в ответ. Если у клиента актуальная версия,
+    вернуть готовый ответ 304, иначе None.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    response.headers.update(headers)
+
+    # If-Modified-Since учитывается только без If-None-Match
+    if etag_matches(if_none_match, etag) or (
+        if_none_match is None and not_modified_since(if_modified_since, last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+    return None
+
+def _expanded_parts(row, expand):
+    """Версии заявки и её комментариев плюс видимые поля связанных пользователей"""
+    versions = [(row.request_id, row.version)]
+    users = [getattr(row, name) for name in ("client", "master") if name in expand]
+    if "comments" in expand:
+        for comment in row.comments:
+            versions.append((comment.comment_id, comment.version))
+            users.append(comment.master)
+        versions.append(("next", row.comments_next_cursor or ""))
+    # У пользователей нет версии, поэтому в тег входят сами поля
+    return versions, "".join(f"|{u.user_id}:{u.fio}:{u.user_type}" for u in users if u is not None)
+
+def request_etag(row, expand=()) -> str:
+    if not expand:
+        return row_etag("request", row.request_id, row.version)
+    versions, users = _expanded_parts(row, expand)
+    return list_etag("request", versions, ",".join(sorted(expand)) + users)
+
+def requests_etag(rows, next_cursor: Optional[str] = None, expand=()) -> str:
+    if not expand:
+        return list_etag("requests", ((r.request_id, r.version) for r in rows), next_cursor or "")
+    versions, extra = [], [",".join(sorted(expand))]
+    for row in rows:
+        row_versions, users = _expanded_parts(row, expand)
+        versions += row_versions
+        extra.append(users)
+    extra.append(next_cursor or "")
+    return list_etag("requests", versions, ";".join(extra))
+
+def comments_etag(rows, next_cursor: Optional[str] = None) -> str:
+    return list_etag("comments", ((c.comment_id, c.version) for c in rows), next_cursor or "")
@@ -1,17 +1,172 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from . import models, schemas
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import text, func, or_, cast, literal, literal_column, Double, insert, update, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DataError, IntegrityError
+from . import models, schemas, stats
+from .pagination import decode_cursor, encode_cursor, paginate
 
-def get_requests(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Request).offset(skip).limit(limit).all()
+# Допустимые ключи сортировки списка заявок (последний столбец — уникальный)
+REQUEST_SORT_KEYS = {
+    "request_id": (models.Request.request_id,),
+    "start_date": (models.Request.start_date, models.Request.request_id),
+}
 
-def get_request(db: Session, request_id: int):
-    return db.query(models.Request).filter(models.Request.request_id == request_id).first()
+# Связи заявки, которые можно развернуть параметром ?expand=
+REQUEST_EXPANSIONS = ("client", "master", "comments")
+# Комментариев в развёрнутой заявке; следующие — по comments_next_cursor
+EXPANDED_COMMENTS_LIMIT = 20
+
+def parse_expand(expand: str = None) -> frozenset:
+    """Разобрать ?expand=client,master,comments"""
+    names = frozenset(name.strip() for name in (expand or "").split(",") if name.strip())
+    unknown = names.difference(REQUEST_EXPANSIONS)
+    if unknown:
+        raise ValueError(f"Неизвестные связи в expand: {', '.join(sorted(unknown))} "
+                         f"(доступны {', '.join(REQUEST_EXPANSIONS)})")
+    return names
+
+def expand_options(expand):
+    """
+    Опции загрузки связей заявки. client и master присоединяются к основному
+    запросу (JOIN), комментарии загружает load_expanded_comments. Остальные
+    связи остаются незагруженными и при сериализации не читаются
+    (см. schemas.loaded_attributes).
+    """
+    options = []
+    if "client" in expand:
+        options.append(joinedload(models.Request.client))
+    if "master" in expand:
+        options.append(joinedload(models.Request.master))
+    return options
+
+def load_expanded_comments(db: Session, rows, cursor: str = None, limit: int = EXPANDED_COMMENTS_LIMIT):
+    """
+    Первые limit комментариев (с авторами) каждой заявки одним запросом с
+    row_number() по заявке. Заявка получает comments и comments_next_cursor —
+    курсор для ?comments_cursor= и /requests/{id}/comments?cursor=.
+    """
+    if not rows:
+        return
+    position = func.row_number().over(partition_by=models.Comment.request_id,
+                                      order_by=models.Comment.comment_id)
+    numbered = db.query(models.Comment.comment_id, position.label("position")).filter(
+        models.Comment.request_id.in_([row.request_id for row in rows])
+    )
+    if cursor:
+        after, = decode_cursor(cursor, (models.Comment.comment_id,))
+        numbered = numbered.filter(models.Comment.comment_id > after)
+    numbered = numbered.subquery()
+    comments = db.query(models.Comment).join(
+        numbered, numbered.c.comment_id == models.Comment.comment_id
+    ).filter(
+        numbered.c.position <= limit + 1
+    ).options(joinedload(models.Comment.master)).order_by(models.Comment.comment_id).all()
+
+    by_request = {}
+    for comment in comments:
+        by_request.setdefault(comment.request_id, []).append(comment)
+    for row in rows:
+        page = by_request.get(row.request_id, [])
+        set_committed_value(row, "comments", page[:limit])
+        row.comments_next_cursor = encode_cursor([page[limit - 1].comment_id]) if len(page) > limit else None
+
+def with_expanded_comments(db: Session, result, expand):
+    rows, next_cursor = result
+    if expand and "comments" in expand:
+        load_expanded_comments(db, rows)
+    return rows, next_cursor
+
+def requests_query(db: Session, expand=None, columns=None):
+    """Заявки целиком или, если заданы columns, кортежи колонок (быстрый путь списков)"""
+    if columns:
+        return db.query(*columns)
+    query = db.query(models.Request)
+    if expand is not None:
+        query = query.options(*expand_options(expand))
+    return query
+
+def get_requests(db: Session, limit: int = 100, cursor: str = None, sort: str = "request_id",
+                 expand=None, columns=None):
+    return with_expanded_comments(
+        db, paginate(requests_query(db, expand, columns), REQUEST_SORT_KEYS[sort], cursor=cursor, limit=limit),
+        expand
+    )
+
+def request_filters(number: int = None, status: str = None, tech_type: str = None,
+                    client_id: int = None, master_id: int = None):
+    """Условия фильтров /requests/search"""
+    conditions = []
+    if number is not None:
+        conditions.append(models.Request.request_id == number)
+    if status is not None:
+        conditions.append(models.Request.request_status == status)
+    if tech_type is not None:
+        conditions.append(models.Request.climate_tech_type == tech_type)
+    if client_id is not None:
+        conditions.append(models.Request.client_id == client_id)
+    if master_id is not None:
+        conditions.append(models.Request.master_id == master_id)
+    return conditions
+
+def search_requests_query(db: Session, expand=None, columns=None, **filters):
+    """Запрос заявок с фильтрами /requests/search"""
+    return requests_query(db, expand, columns).filter(*request_filters(**filters))
+
+# Выражения полнотекстового поиска; совпадают с индексами миграции 0002,
+# поэтому конфигурация задана литералом, а не параметром запроса
+FTS_CONFIG = literal_column("'russian'::regconfig")
+FTS_DOCUMENT = func.to_tsvector(FTS_CONFIG, models.Request.problem_description)
+
+def text_search_filter(q: str):
+    """Совпадение по тексту: описание проблемы (FTS) или модель (триграммы)"""
+    ts_query = func.websearch_to_tsquery(FTS_CONFIG, q)
+    model_match = literal(q).op("<%")(models.Request.climate_tech_model)
+    return or_(FTS_DOCUMENT.op("@@")(ts_query), model_match)
+
+def search_requests(db: Session, limit: int = 50, cursor: str = None, sort: str = "start_date",
+                    q: str = None, expand=None, columns=None, **filters):
+    query = search_requests_query(db, expand, columns, **filters)
+    if q and q.strip():
+        result = search_requests_ranked(query, q.strip(), limit=limit, cursor=cursor, entity=not columns)
+    else:
+        result = paginate(query, REQUEST_SORT_KEYS[sort], cursor=cursor, limit=limit)
+    return with_expanded_comments(db, result, expand)
+
+def search_requests_ranked(query, q: str, limit: int = 50, cursor: str = None, entity: bool = True):
+    """
+    Поиск по тексту: полнотекстовый по problem_description и триграммный
+    по climate_tech_model. Результаты упорядочены по релевантности.
+    entity=False — query выбирает колонки, строки возвращаются как есть.
+    """
+    ts_query = func.websearch_to_tsquery(FTS_CONFIG, q)
+    # Считаем в double precision: значение курсора должно точно совпадать
+    # со значением в БД при обратном чтении из JSON
+    score = (
+        cast(func.ts_rank(FTS_DOCUMENT, ts_query), Double)
+        + cast(func.word_similarity(q, models.Request.climate_tech_model), Double)
+    )
+
+    query = query.add_columns(score.label("score")).filter(text_search_filter(q))
+    rows, next_cursor = paginate(
+        query, (score, models.Request.request_id), cursor=cursor, limit=limit,
+        descending=True, key=lambda row: [row.score, (row.Request if entity else row).request_id]
+    )
+    if not entity:
+        return rows, next_cursor
+    return [row.Request for row in rows], next_cursor
+
+def get_request(db: Session, request_id: int, expand=None, comments_cursor: str = None):
+    row = requests_query(db, expand).filter(models.Request.request_id == request_id).first()
+    if row is not None and expand and "comments" in expand:
+        load_expanded_comments(db, [row], cursor=comments_cursor)
+    return row
 
 def create_request(db: Session, request: schemas.RequestCreate):
     try:
         db_request = models.Request(**request.dict())
         db.add(db_request)
+        stats.apply_request_change(db, new=stats.snapshot(db_request))
         db.commit()
         db.refresh(db_request)
         return db_request
@@ -32,6 +187,7 @@ def create_request(db: Session, request: schemas.RequestCreate):
                 # Пробуем снова создать заявку
                 db_request = models.Request(**request.dict())
                 db.add(db_request)
+                stats.apply_request_change(db, new=stats.snapshot(db_request))
                 db.commit()
                 db.refresh(db_request)
                 return db_request
@@ -42,26 +198,174 @@ def create_request(db: Session, request: schemas.RequestCreate):
         else:
             raise e
 
+# Пределы столбцов INTEGER в PostgreSQL
+INT_MIN, INT_MAX = -2**31, 2**31 - 1
+
+def column_problems(table, values: dict) -> list:
+    """Значения, которых не примут столбцы таблицы: длиннее String(n) или вне INTEGER"""
+    problems = []
+    for column in table.columns:
+        value = values.get(column.name)
+        length = getattr(column.type, "length", None)
+        if isinstance(value, str) and length and len(value) > length:
+            problems.append(f"{column.name}: не длиннее {length} символов")
+        elif isinstance(value, int) and isinstance(column.type, Integer) and not INT_MIN <= value <= INT_MAX:
+            problems.append(f"{column.name}: значение вне допустимого диапазона")
+    return problems
+
+def db_error_message(e) -> str:
+    """Первая строка сообщения PostgreSQL без контекста SQLAlchemy"""
+    return str(e.orig).strip().splitlines()[0]
+
+def insert_requests(db: Session, rows: list[dict]):
+    # Идентификаторы выдаёт последовательность, порядок RETURNING совпадает с порядком rows
+    return db.scalars(
+        insert(models.Request).returning(models.Request, sort_by_parameter_order=True), rows
+    ).all()
+
+def create_requests(db: Session, requests: list[schemas.RequestCreate]):
+    """
+    Создать заявки пачкой: один многострочный INSERT ... RETURNING в одной
+    транзакции. Заявки со ссылками на несуществующих пользователей и со
+    значениями, которых не примут столбцы, не вставляются. Если пачку всё же
+    отвергла БД (ограничение, ошибка данных), заявки вставляются по одной,
+    и ошибка сообщается для своей позиции.
+    Возвращает ({позиция: RequestOut}, {позиция: [ошибки]}).
+    """
+    values = [r.dict() for r in requests]
+    errors = {}
+    for i, v in enumerate(values):
+        problems = column_problems(models.Request.__table__, v)
+        if problems:
+            errors[i] = problems
+
+    user_ids = set()
+    for i, v in enumerate(values):
+        if i not in errors:
+            user_ids.update(uid for uid in (v["client_id"], v["master_id"]) if uid is not None)
+    existing = set()
+    if user_ids:
+        existing = {uid for (uid,) in db.query(models.User.user_id).filter(models.User.user_id.in_(user_ids))}
+
+    rows, positions = [], []
+    for i, v in enumerate(values):
+        if i in errors:
+            continue
+        problems = []
+        if v["client_id"] not in existing:
+            problems.append(f"Клиент {v['client_id']} не найден")
+        if v["master_id"] is not None and v["master_id"] not in existing:
+            problems.append(f"Специалист {v['master_id']} не найден")
+        if problems:
+            errors[i] = problems
+            continue
+        rows.append(v)
+        positions.append(i)
+
+    if not rows:
+        return {}, errors
+
+    try:
+        created = insert_requests(db, rows)
+    except (IntegrityError, DataError):
+        db.rollback()
+        created, inserted = [], []
+        for i, row in zip(positions, rows):
+            try:
+                with db.begin_nested():
+                    created += insert_requests(db, [row])
+                inserted.append(i)
+            except (IntegrityError, DataError) as e:
+                errors[i] = [f"Заявка не сохранена: {db_error_message(e)}"]
+        positions = inserted
+    stats.apply_request_changes(db, [(None, stats.snapshot(r)) for r in created])
+    # Сериализуем до commit, иначе каждая заявка перечитывалась бы отдельным запросом
+    result = {i: schemas.RequestOut.model_validate(r) for i, r in zip(positions, created)}
+    db.commit()
+    return result, errors
+
+def lock_request(db: Session, request_id: int):
+    """
+    Заявка с блокировкой строки (SELECT ... FOR UPDATE) до конца транзакции:
+    параллельное изменение или удаление той же заявки ждёт commit, поэтому
+    старые значения для статистики не устаревают.
+    """
+    return db.query(models.Request).filter(
+        models.Request.request_id == request_id
+    ).with_for_update().populate_existing().first()
+
 def update_request(db: Session, request_id: int, request_update: schemas.RequestUpdate):
-    db_request = get_request(db, request_id)
+    db_request = lock_request(db, request_id)
     if not db_request:
         return None
+    old = stats.snapshot(db_request)
     for key, value in request_update.dict(exclude_unset=True).items():
         setattr(db_request, key, value)
+    stats.apply_request_change(db, old=old, new=stats.snapshot(db_request))
     db.commit()
     db.refresh(db_request)
     return db_request
 
+def ids_match(column, ids):
+    """column = ANY(:ids) — один параметр-массив вместо списка IN"""
+    return column == any_(bindparam(None, list(ids), type_=ARRAY(Integer)))
+
+def update_requests(db: Session, patch: dict, request_ids: list[int] = None, filters: dict = None,
+                    limit: int = 1000):
+    """
+    Применить patch к заявкам по списку request_id или фильтру одним
+    UPDATE ... WHERE request_id = ANY(...) RETURNING. Строки предварительно
+    блокируются по возрастанию id, чтобы снять старые значения для статистики.
+    Возвращает (обновлённые RequestOut, не найденные id) или None, если
+    под фильтр попало больше limit заявок.
+    """
+    if patch.get("master_id") is not None and get_user(db, patch["master_id"]) is None:
+        raise ValueError(f"Специалист {patch['master_id']} не найден")
+
+    snapshot_columns = (models.Request.request_id, models.Request.client_id,
+                        models.Request.climate_tech_type, models.Request.problem_description,
+                        models.Request.start_date, models.Request.completion_date)
+    query = db.query(*snapshot_columns).filter(*request_filters(**(filters or {})))
+    if request_ids is not None:
+        query = query.filter(ids_match(models.Request.request_id, request_ids))
+    locked = query.order_by(models.Request.request_id).limit(limit + 1).with_for_update().all()
+    if len(locked) > limit:
+        db.rollback()
+        return None
+
+    found = {row.request_id for row in locked}
+    missing = [i for i in dict.fromkeys(request_ids or []) if i not in found]
+    if not locked:
+        db.rollback()
+        return [], missing
+
+    rows = db.execute(
+        update(models.Request)
+        .where(ids_match(models.Request.request_id, found))
+        .values(**patch)
+        .returning(*models.Request.__table__.c),
+        execution_options={"synchronize_session": False}
+    ).all()
+
+    old = {row.request_id: dict(row._mapping) for row in locked}
+    stats.apply_request_changes(db, [(old[row.request_id], dict(row._mapping)) for row in rows])
+    db.commit()
+    updated = sorted((schemas.RequestOut.model_validate(dict(row._mapping)) for row in rows),
+                     key=lambda r: r.request_id)
+    return updated, missing
+
 def delete_request(db: Session, request_id: int):
-    db_request = get_request(db, request_id)
+    db_request = lock_request(db, request_id)
     if not db_request:
         return None
+    stats.apply_request_change(db, old=stats.snapshot(db_request))
     db.delete(db_request)
     db.commit()
     return db_request
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, limit: int = 100, cursor: str = None, columns=None):
+    query = db.query(*columns) if columns else db.query(models.User)
+    return paginate(query, (models.User.user_id,), cursor=cursor, limit=limit)
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.user_id == user_id).first()
@@ -112,12 +416,20 @@ def delete_user(db: Session, user_id: int):
     db_user = get_user(db, user_id)
     if not db_user:
         return None
+    # Заявки клиента остаются без client_id — его личная статистика больше не нужна
+    stats.remove_client(db, user_id)
     db.delete(db_user)
     db.commit()
+    invalidate_principal(user_id)
     return db_user
 
-def get_comments(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Comment).offset(skip).limit(limit).all()
+def get_comments(db: Session, limit: int = 100, cursor: str = None, columns=None):
+    query = db.query(*columns) if columns else db.query(models.Comment)
+    return paginate(query, (models.Comment.comment_id,), cursor=cursor, limit=limit)
+
+def get_request_comments(db: Session, request_id: int, limit: int = 100, cursor: str = None):
+    q = db.query(models.Comment).filter(models.Comment.request_id == request_id)
+    return paginate(q, (models.Comment.comment_id,), cursor=cursor, limit=limit)
 
 def get_comment(db: Session, comment_id: int):
     return db.query(models.Comment).filter(models.Comment.comment_id == comment_id).first()
@@ -164,7 +476,7 @@ def delete_comment(db: Session, comment_id: int):
     db.commit()
     return db_comment
 
-from .auth import hash_password
+from .auth import hash_password, invalidate_principal
 
 def get_user_by_login(db: Session, login: str):
     return db.query(models.User).filter(models.User.login == login).first()
\ No newline at end of file
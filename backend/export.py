@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from sqlalchemy import select
+from . import crud, database, models
+from .loader import SOURCES
+
+# Выгрузка заявок потоком: строки читаются серверным курсором партиями
+# по EXPORT_BATCH и сразу отдаются клиенту, память не зависит от объёма таблицы.
+# CSV совпадает по формату с data/inputDataRequests.csv и загружается обратно
+# через python -m backend.loader.
+
+EXPORT_BATCH = 2000
+# Колонки таблицы -> заголовки CSV (обратное отображение загрузчика)
+CSV_HEADERS = {column: header for header, column in SOURCES["requests"][1].items()}
+EXPORT_COLUMNS = [models.Request.__table__.c[name] for name in CSV_HEADERS]
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+def export_statement(q: str = None, **filters):
+    """SELECT заявок с фильтрами /requests/search в порядке request_id"""
+    stmt = select(*EXPORT_COLUMNS).where(*crud.request_filters(**filters))
+    if q and q.strip():
+        stmt = stmt.where(crud.text_search_filter(q.strip()))
+    return stmt.order_by(models.Request.request_id)
+
+def _csv_value(value):
+    if value is None:
+        return "null"
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+def encode_rows(rows, fmt: str) -> bytes:
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf, delimiter=";", lineterminator="\r\n")
+        for row in rows:
+            writer.writerow([_csv_value(v) for v in row])
+    else:
+        for row in rows:
+            buf.write(json.dumps(dict(row._mapping), ensure_ascii=False, default=str))
+            buf.write("\n")
+    return buf.getvalue().encode("utf-8")
+
+def _header(fmt: str) -> bytes:
+    if fmt != "csv":
+        return b""
+    return (";".join(CSV_HEADERS.values()) + "\r\n").encode("utf-8")
+
+def iter_export(stmt, fmt: str):
+    """Синхронная выгрузка (psycopg2, серверный курсор через yield_per)"""
+    yield _header(fmt)
+    with database.engine.connect() as conn:
+        result = conn.execution_options(yield_per=EXPORT_BATCH).execute(stmt)
+        for rows in result.partitions():
+            yield encode_rows(rows, fmt)
+
+async def aiter_export(stmt, fmt: str):
+    """Асинхронная выгрузка (asyncpg, AsyncConnection.stream)"""
+    yield _header(fmt)
+    async with database.async_engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=EXPORT_BATCH))
+        async for rows in result.partitions():
+            yield encode_rows(rows, fmt)
+
+def stream_export(stmt, fmt: str):
+    """Итератор для StreamingResponse в текущем режиме работы с БД"""
+    if database.DB_ASYNC:
+        return aiter_export(stmt, fmt)
+    return iter_export(stmt, fmt)
@@ -0,0 +1,34 @@
+import os
+import orjson
+from fastapi import Response
+from . import models, schemas
+
+# Быстрый путь для списков (FAST_JSON=1): вместо ORM-объектов выбираются
+# только нужные колонки, строки превращаются в словари по готовому списку
+# имён и кодируются orjson. Поля и формат ответа совпадают с response_model,
+# Pydantic-проверка на выходе пропускается.
+
+FAST_JSON = os.environ.get("FAST_JSON", "0") == "1"
+
+def _columns(model, out_schema, extra=()):
+    """Колонки полей схемы ответа; extra нужны только для ETag и в ответ не попадают"""
+    table = model.__table__
+    names = list(out_schema.model_fields)
+    return [table.c[name] for name in names + list(extra)], names
+
+REQUEST_COLUMNS, REQUEST_FIELDS = _columns(models.Request, schemas.RequestOut, extra=("version",))
+COMMENT_COLUMNS, COMMENT_FIELDS = _columns(models.Comment, schemas.CommentOut, extra=("version",))
+USER_COLUMNS, USER_FIELDS = _columns(models.User, schemas.UserOut)
+
+def rows_to_dicts(rows, fields):
+    # zip обрезает лишние колонки (version, score) по длине fields
+    return [dict(zip(fields, row)) for row in rows]
+
+def json_response(rows, fields, response: Response) -> Response:
+    """
+    Готовый JSON-ответ из строк-кортежей. Заголовки, выставленные маршрутом
+    (X-Next-Cursor, ETag), переносятся: готовый Response FastAPI отдаёт как есть.
+    """
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return Response(orjson.dumps(rows_to_dicts(rows, fields)),
+                    media_type="application/json", headers=headers)
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import io
+import os
+import time
+from datetime import date
+from sqlalchemy import Date, Integer, insert, text
+from . import models, stats
+from .database import engine
+
+# Загрузка data/*.csv и выгрузок того же формата: разделитель ";",
+# отсутствующее значение — "null", заголовки в camelCase.
+# Запуск: python -m backend.loader [--users F] [--requests F] [--comments F]
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+# Файл -> (модель, {заголовок CSV: атрибут модели}); порядок важен из-за внешних ключей
+SOURCES = {
+    "users": (models.User, {
+        "userID": "user_id",
+        "fio": "fio",
+        "phone": "phone",
+        "login": "login",
+        "password": "password",
+        "type": "user_type",
+    }),
+    "requests": (models.Request, {
+        "requestID": "request_id",
+        "startDate": "start_date",
+        "climateTechType": "climate_tech_type",
+        "climateTechModel": "climate_tech_model",
+        "problemDescryption": "problem_description",
+        "requestStatus": "request_status",
+        "completionDate": "completion_date",
+        "repairParts": "repair_parts",
+        "masterID": "master_id",
+        "clientID": "client_id",
+    }),
+    "comments": (models.Comment, {
+        "commentID": "comment_id",
+        "message": "message",
+        "masterID": "master_id",
+        "requestID": "request_id",
+    }),
+}
+DEFAULT_FILES = {
+    "users": os.path.join(DATA_DIR, "inputDataUsers.csv"),
+    "requests": os.path.join(DATA_DIR, "inputDataRequests.csv"),
+    "comments": os.path.join(DATA_DIR, "inputDataComments.csv"),
+}
+NULL_TOKEN = "null"
+BATCH_SIZE = 10000
+
+def _converter(column):
+    if isinstance(column.type, Integer):
+        convert = int
+    elif isinstance(column.type, Date):
+        convert = date.fromisoformat
+    else:
+        convert = str
+
+    def parse(raw: str):
+        if raw == NULL_TOKEN or (raw == "" and column.nullable):
+            return None
+        return convert(raw)
+    return parse
+
+def read_rows(path: str, model, mapping):
+    """Построчно читать CSV и отдавать словари {колонка таблицы: значение}"""
+    table = model.__table__
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        header = next(reader)
+        unknown = [h for h in header if h not in mapping]
+        if unknown:
+            raise ValueError(f"{path}: неизвестные колонки {', '.join(unknown)}")
+        columns = [table.c[mapping[h]] for h in header]
+        parsers = [_converter(c) for c in columns]
+        names = [c.name for c in columns]
+        for line_no, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            if len(row) != len(names):
+                raise ValueError(f"{path}:{line_no}: ожидалось {len(names)} полей, получено {len(row)}")
+            try:
+                yield {name: parse(raw) for name, parse, raw in zip(names, parsers, row)}
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from None
+
+def batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _copy_value(value) -> str:
+    """Значение в текстовом формате COPY: \\N — NULL, спецсимволы экранируются"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return (value.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+    return str(value)
+
+def _copy_batch(conn, table, batch):
+    """COPY ... FROM STDIN одной партии (только PostgreSQL/psycopg2)"""
+    names = list(batch[0])
+    buf = io.StringIO()
+    for row in batch:
+        buf.write("\t".join(_copy_value(row[n]) for n in names))
+        buf.write("\n")
+    buf.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.schema}.{table.name} ({', '.join(names)}) FROM STDIN", buf)
+    finally:
+        cursor.close()
+
+def load_file(conn, name: str, path: str, method: str = "copy", batch_size: int = BATCH_SIZE) -> int:
+    """Загрузить один файл партиями, вернуть число строк"""
+    model, mapping = SOURCES[name]
+    table = model.__table__
+    count = 0
+    for batch in batches(read_rows(path, model, mapping), batch_size):
+        if method == "copy":
+            _copy_batch(conn, table, batch)
+        else:
+            # executemany в SQLAlchemy 2.0 собирает многострочные INSERT ... VALUES
+            conn.execute(insert(table), batch)
+        count += len(batch)
+    return count
+
+def resync_sequences(conn):
+    """Выставить *_id_seq после явно заданных идентификаторов"""
+    for model in (models.User, models.Request, models.Comment):
+        table = model.__table__
+        pk = table.primary_key.columns.values()[0].name
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.schema}.{table.name}', '{pk}'), "
+            f"COALESCE((SELECT MAX({pk}) FROM {table.schema}.{table.name}), 0) + 1, false)"
+        ))
+
+def load(files: dict, method: str = None, batch_size: int = BATCH_SIZE, bind=engine, log=print):
+    """
+    Загрузить файлы {users|requests|comments: путь} в одной транзакции,
+    затем синхронизировать последовательности и пересчитать статистику.
+    """
+    postgres = bind.dialect.name == "postgresql"
+    method = method or ("copy" if postgres else "insert")
+    totals = {}
+    started = time.perf_counter()
+    with bind.begin() as conn:
+        for name in SOURCES:
+            if name not in files:
+                continue
+            file_started = time.perf_counter()
+            count = load_file(conn, name, files[name], method=method, batch_size=batch_size)
+            elapsed = time.perf_counter() - file_started
+            totals[name] = count
+            log(f"{name}: {count} строк за {elapsed:.2f} с ({count / elapsed if elapsed else 0:.0f} строк/с)")
+
+        if postgres:
+            resync_sequences(conn)
+            if "requests" in files:
+                stats.rebuild(conn)
+
+    elapsed = time.perf_counter() - started
+    total = sum(totals.values())
+    log(f"Всего: {total} строк за {elapsed:.2f} с ({total / elapsed if elapsed else 0:.0f} строк/с)")
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка CSV (users, requests, comments) в БД")
+    for name in SOURCES:
+        parser.add_argument(f"--{name}", metavar="FILE", help=f"CSV с {name}")
+    parser.add_argument("--method", choices=["copy", "insert"],
+                        help="COPY (по умолчанию для PostgreSQL) или многострочные INSERT")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    files = {name: getattr(args, name) for name in SOURCES if getattr(args, name)}
+    # Без аргументов загружаем исходные данные проекта
+    load(files or DEFAULT_FILES, method=args.method, batch_size=args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,44 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Depends, Request, Response
 from backend.routers import users, requests, comments, auth as auth_router, client
-from .database import Base, engine
+from .auth import require_roles
+from .database import Base, engine, async_engine, pool_metrics
+from . import metrics, querystats
+from .migrate import apply_migrations
 
 # Создание таблиц (если их нет)
 Base.metadata.create_all(bind=engine)
+# Индексы и прочие изменения схемы для уже существующих БД
+apply_migrations(engine)
 
 app = FastAPI(title="Climate Service API")
 
+querystats.install(engine)
+if async_engine is not None:
+    querystats.install(async_engine.sync_engine)
+
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    """Число SQL-запросов, время в БД и метрики Prometheus на каждый HTTP-запрос"""
+    method, route = request.method, metrics.route_template(app, request.scope)
+    in_progress = metrics.IN_PROGRESS.labels(method, route)
+    in_progress.inc()
+    stats, token = querystats.start(f"{method} {route}")
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        querystats.finish(token)
+        in_progress.dec()
+        metrics.observe(method, route, status, time.perf_counter() - started, stats)
+    if querystats.QUERY_HEADERS:
+        # Для потоковых ответов учтены только запросы до начала отдачи тела
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.duration * 1000:.2f}"
+    return response
+
 # Подключаем роутеры
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(requests.router, prefix="/requests", tags=["Requests"])
@@ -17,6 +49,23 @@ app.include_router(client.router, prefix="/client", tags=["Client"])
 from backend.routers import qr
 app.include_router(qr.router, prefix="/qr", tags=["QR"])
 
+@app.on_event("shutdown")
+async def shutdown_resources():
+    qr.shutdown_label_pool()
+    if async_engine is not None:
+        await async_engine.dispose()
+
 @app.get("/")
 def root():
     return {"message": "Climate Service API", "version": "1.0.0"}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Метрики для Prometheus: без авторизации, закрывайте доступ снаружи на прокси"""
+    content, content_type = metrics.render()
+    return Response(content, media_type=content_type)
+
+@app.get("/internal/db-pool", tags=["Internal"])
+def db_pool_metrics(current=Depends(require_roles('Менеджер'))):
+    """Загрузка пула соединений с БД в этом процессе (занято, переполнение, ожидание)"""
+    return pool_metrics()
@@ -0,0 +1,52 @@
+import os
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from starlette.routing import Match
+
+# Метрики HTTP-запросов для Prometheus (GET /metrics). Метка route — шаблон
+# пути (/requests/{request_id}), а не сам путь, чтобы число рядов не росло
+# с числом заявок. При нескольких воркерах задайте PROMETHEUS_MULTIPROC_DIR —
+# тогда /metrics собирает значения всех процессов.
+
+# Запросы, не попавшие ни в один маршрут (404), — одной меткой
+UNMATCHED = "<unmatched>"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+REQUESTS = Counter("http_requests_total", "HTTP-запросы по маршрутам и кодам ответа",
+                   ["method", "route", "status"])
+LATENCY = Histogram("http_request_duration_seconds", "Время ответа (до начала отдачи тела)",
+                    ["method", "route"], buckets=LATENCY_BUCKETS)
+IN_PROGRESS = Gauge("http_requests_in_progress", "Запросы в обработке", ["method", "route"],
+                    multiprocess_mode="livesum")
+DB_QUERIES = Histogram("http_request_db_queries", "SQL-запросов на HTTP-запрос",
+                       ["method", "route"], buckets=QUERY_BUCKETS)
+DB_TIME = Histogram("http_request_db_duration_seconds", "Время в БД на HTTP-запрос",
+                    ["method", "route"], buckets=LATENCY_BUCKETS)
+
+def route_template(app, scope) -> str:
+    """Шаблон пути маршрута, который обработает запрос"""
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED)
+        # Путь совпал, метод нет (405) — как и Starlette, берём первый такой маршрут
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path", UNMATCHED)
+    return partial or UNMATCHED
+
+def observe(method: str, route: str, status: int, elapsed: float, stats):
+    REQUESTS.labels(method, route, str(status)).inc()
+    LATENCY.labels(method, route).observe(elapsed)
+    DB_QUERIES.labels(method, route).observe(stats.count)
+    DB_TIME.labels(method, route).observe(stats.duration)
+
+def render():
+    """Текст для Prometheus и его Content-Type"""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
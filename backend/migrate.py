@@ -0,0 +1,71 @@
+import os
+from sqlalchemy import text
+from .database import engine
+
+# Версионированные SQL-миграции: файлы migrations/NNNN_*.sql применяются
+# по порядку, применённые версии хранятся в climate_service.schema_migrations.
+# Запуск вручную: python -m backend.migrate
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+# Ключ advisory-блокировки: миграции запускаются при импорте main.py в каждом
+# воркере, и применять их одновременно может только один процесс
+MIGRATIONS_LOCK_ID = 724_031_001
+
+def lock_migrations(conn):
+    """Дождаться блокировки миграций до конца текущей транзакции"""
+    conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+
+def applied_versions(conn) -> set:
+    return {row[0] for row in conn.execute(text("SELECT version FROM climate_service.schema_migrations"))}
+
+def list_migrations():
+    """Список (версия, путь) всех миграций по возрастанию версии"""
+    result = []
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        if name.endswith(".sql"):
+            result.append((name[:-4], os.path.join(MIGRATIONS_DIR, name)))
+    return result
+
+def apply_migrations(bind=engine):
+    """Применить все ещё не применённые миграции, вернуть список версий"""
+    with bind.begin() as conn:
+        # CREATE ... IF NOT EXISTS тоже не защищён от гонки двух процессов
+        lock_migrations(conn)
+        conn.execute(text("CREATE SCHEMA IF NOT EXISTS climate_service"))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS climate_service.schema_migrations (
+                version VARCHAR(255) PRIMARY KEY,
+                applied_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """))
+        applied = applied_versions(conn)
+
+    done = []
+    for version, path in list_migrations():
+        if version in applied:
+            continue
+        with open(path, encoding="utf-8") as f:
+            sql = f.read()
+        # Каждая миграция — отдельная транзакция вместе с отметкой о применении.
+        # Под блокировкой версия проверяется заново: пока мы ждали, её мог
+        # применить другой воркер
+        with bind.begin() as conn:
+            lock_migrations(conn)
+            if version in applied_versions(conn):
+                continue
+            conn.execution_options(no_parameters=True).exec_driver_sql(sql)
+            conn.execute(
+                text("INSERT INTO climate_service.schema_migrations (version) VALUES (:v)"),
+                {"v": version}
+            )
+        done.append(version)
+    return done
+
+if __name__ == "__main__":
+    applied = apply_migrations()
+    if applied:
+        for version in applied:
+            print(f"Применена миграция {version}")
+    else:
+        print("Новых миграций нет")
@@ -0,0 +1,24 @@
+-- Составные и частичные индексы под фильтры /requests/search и списки заявок.
+-- Хвостовой request_id нужен для keyset-пагинации по (start_date, request_id).
+
+CREATE INDEX IF NOT EXISTS ix_requests_start_date
+    ON climate_service.requests (start_date, request_id);
+
+CREATE INDEX IF NOT EXISTS ix_requests_status_start_date
+    ON climate_service.requests (request_status, start_date, request_id);
+
+CREATE INDEX IF NOT EXISTS ix_requests_master_status
+    ON climate_service.requests (master_id, request_status);
+
+CREATE INDEX IF NOT EXISTS ix_requests_client_start_date
+    ON climate_service.requests (client_id, start_date, request_id);
+
+CREATE INDEX IF NOT EXISTS ix_requests_tech_type_start_date
+    ON climate_service.requests (climate_tech_type, start_date, request_id);
+
+-- Только открытые (незавершённые) заявки — основная рабочая выборка операторов
+CREATE INDEX IF NOT EXISTS ix_requests_open_start_date
+    ON climate_service.requests (start_date, request_id)
+    WHERE completion_date IS NULL;
+
+ANALYZE climate_service.requests;
@@ -0,0 +1,13 @@
+-- Полнотекстовый поиск по описанию проблемы (русская морфология)
+-- и нечёткий поиск по модели оборудования (триграммы).
+-- Выражение индекса должно совпадать с crud.FTS_DOCUMENT.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_requests_problem_fts
+    ON climate_service.requests
+    USING gin (to_tsvector('russian'::regconfig, problem_description));
+
+CREATE INDEX IF NOT EXISTS ix_requests_model_trgm
+    ON climate_service.requests
+    USING gin (climate_tech_model gin_trgm_ops);
@@ -0,0 +1,34 @@
+-- Таблица агрегатов статистики заявок и её первоначальное заполнение.
+-- Дальше агрегаты поддерживаются приращениями из backend/stats.py.
+
+CREATE TABLE IF NOT EXISTS climate_service.request_stats (
+    client_id INTEGER NOT NULL,
+    dimension VARCHAR(20) NOT NULL,
+    bucket_key VARCHAR(32) NOT NULL,
+    bucket TEXT NOT NULL,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    repair_days_sum BIGINT NOT NULL DEFAULT 0,
+    repair_days_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (client_id, dimension, bucket_key)
+);
+
+DELETE FROM climate_service.request_stats;
+
+INSERT INTO climate_service.request_stats
+    (client_id, dimension, bucket_key, bucket,
+     total_count, completed_count, repair_days_sum, repair_days_count)
+SELECT COALESCE(s.client_id, 0), s.dimension, md5(s.bucket), s.bucket,
+       count(*),
+       count(s.completion_date),
+       COALESCE(sum(s.days) FILTER (WHERE s.days >= 0), 0),
+       count(*) FILTER (WHERE s.days >= 0)
+FROM (
+    SELECT r.client_id, d.dimension, d.bucket, r.completion_date,
+           r.completion_date - r.start_date AS days
+    FROM climate_service.requests r
+    CROSS JOIN LATERAL (VALUES ('tech', r.climate_tech_type),
+                               ('problem', r.problem_description)) AS d(dimension, bucket)
+) s
+GROUP BY GROUPING SETS ((s.dimension, s.bucket), (s.client_id, s.dimension, s.bucket))
+HAVING GROUPING(s.client_id) = 1 OR s.client_id IS NOT NULL;
@@ -0,0 +1,5 @@
+-- Комментарии к заявке выбираются по request_id с сортировкой по comment_id
+-- (GET /requests/{request_id}/comments, keyset-пагинация).
+
+CREATE INDEX IF NOT EXISTS ix_comments_request_id
+    ON climate_service.comments (request_id, comment_id);
@@ -0,0 +1,29 @@
+-- Версия и время изменения строк заявок и комментариев для условных GET
+-- (ETag / Last-Modified). Поддерживаются триггером, поэтому учитываются
+-- и изменения через ORM, и массовые UPDATE.
+
+ALTER TABLE climate_service.requests
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+ALTER TABLE climate_service.comments
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION climate_service.touch_row_version() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_requests_row_version ON climate_service.requests;
+CREATE TRIGGER trg_requests_row_version
+    BEFORE UPDATE ON climate_service.requests
+    FOR EACH ROW EXECUTE FUNCTION climate_service.touch_row_version();
+
+DROP TRIGGER IF EXISTS trg_comments_row_version ON climate_service.comments;
+CREATE TRIGGER trg_comments_row_version
+    BEFORE UPDATE ON climate_service.comments
+    FOR EACH ROW EXECUTE FUNCTION climate_service.touch_row_version();
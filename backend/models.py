@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, ForeignKey, Index, FetchedValue, func, text
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -18,7 +18,20 @@ class User(Base):
 
 class Request(Base):
     __tablename__ = "requests"
-    __table_args__ = {"schema": "climate_service"}
+    # Индексы под реальные формы запросов /requests/search и списков
+    # (см. migrations/0001_request_search_indexes.sql)
+    __table_args__ = (
+        Index("ix_requests_start_date", "start_date", "request_id"),
+        Index("ix_requests_status_start_date", "request_status", "start_date", "request_id"),
+        Index("ix_requests_master_status", "master_id", "request_status"),
+        Index("ix_requests_client_start_date", "client_id", "start_date", "request_id"),
+        Index("ix_requests_tech_type_start_date", "climate_tech_type", "start_date", "request_id"),
+        Index("ix_requests_open_start_date", "start_date", "request_id",
+              postgresql_where=text("completion_date IS NULL")),
+        # GIN-индексы полнотекстового и триграммного поиска требуют
+        # расширения pg_trgm и создаются только миграцией 0002
+        {"schema": "climate_service"},
+    )
 
     request_id = Column(Integer, primary_key=True, index=True)
     start_date = Column(Date, nullable=False)
@@ -28,6 +41,10 @@ class Request(Base):
     request_status = Column(String(50), nullable=False)
     completion_date = Column(Date, nullable=True)
     repair_parts = Column(Text, nullable=True)
+    # Меняются триггером при каждом UPDATE (migrations/0005_row_versions.sql)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(),
+                        server_onupdate=FetchedValue())
+    version = Column(Integer, nullable=False, server_default=text("1"), server_onupdate=FetchedValue())
 
     master_id = Column(Integer, ForeignKey("climate_service.users.user_id", ondelete="SET NULL"))
     client_id = Column(Integer, ForeignKey("climate_service.users.user_id", ondelete="CASCADE"))
@@ -38,13 +55,34 @@ class Request(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
-    __table_args__ = {"schema": "climate_service"}
+    __table_args__ = (
+        Index("ix_comments_request_id", "request_id", "comment_id"),
+        {"schema": "climate_service"},
+    )
 
     comment_id = Column(Integer, primary_key=True, index=True)
     message = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(),
+                        server_onupdate=FetchedValue())
+    version = Column(Integer, nullable=False, server_default=text("1"), server_onupdate=FetchedValue())
 
     master_id = Column(Integer, ForeignKey("climate_service.users.user_id", ondelete="CASCADE"))
     request_id = Column(Integer, ForeignKey("climate_service.requests.request_id", ondelete="CASCADE"))
 
     master = relationship("User", back_populates="comments")
     request = relationship("Request", back_populates="comments")
+
+class RequestStats(Base):
+    """Агрегаты статистики заявок, поддерживаются приращениями (см. stats.py)"""
+    __tablename__ = "request_stats"
+    __table_args__ = {"schema": "climate_service"}
+
+    client_id = Column(Integer, primary_key=True)  # 0 — все заявки
+    dimension = Column(String(20), primary_key=True)  # tech | problem
+    bucket_key = Column(String(32), primary_key=True)  # md5(bucket)
+    bucket = Column(Text, nullable=False)
+
+    total_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    repair_days_sum = Column(BigInteger, nullable=False, default=0)
+    repair_days_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,77 @@
+import base64
+import json
+from datetime import date
+from sqlalchemy import tuple_
+
+# Keyset (cursor) пагинация: вместо OFFSET запоминаем ключ сортировки
+# последней строки страницы и продолжаем с WHERE (ключ) > (курсор).
+# Стоимость любой страницы равна стоимости первой.
+
+def encode_cursor(values) -> str:
+    """Упаковать значения ключа сортировки в непрозрачный курсор"""
+    plain = [v.isoformat() if isinstance(v, date) else v for v in values]
+    raw = json.dumps(plain, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns) -> list:
+    """Распаковать курсор обратно в значения с типами колонок"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Некорректный курсор")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Некорректный курсор")
+
+    return [coerce_value(column, value) for column, value in zip(columns, values)]
+
+def coerce_value(column, value):
+    """
+    Привести значение из курсора к типу колонки ключа. Подделанный курсор
+    (строка вместо числа и т. п.) — та же ошибка, что и нечитаемый, а не
+    DataError базы при сравнении.
+    """
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    # bool — подкласс int, но ключом сортировки не бывает
+    if value is None or isinstance(value, (bool, list, dict)):
+        raise ValueError("Некорректный курсор")
+    if python_type is date:
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError("Некорректный курсор")
+    if python_type is float and isinstance(value, (int, float)):
+        return float(value)
+    if python_type is not None and not isinstance(value, python_type):
+        raise ValueError("Некорректный курсор")
+    return value
+
+def paginate(query, columns, cursor=None, limit=100, descending=False, key=None):
+    """
+    Выполнить запрос постранично по ключу columns.
+    Возвращает (rows, next_cursor); next_cursor = None на последней странице.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if descending:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    order = [c.desc() for c in columns] if descending else list(columns)
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if key is not None:
+            values = key(last)
+        else:
+            values = [getattr(last, c.key) for c in columns]
+        next_cursor = encode_cursor(values)
+    return rows, next_cursor
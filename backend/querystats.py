@@ -0,0 +1,122 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# Учёт SQL-запросов в пределах одного HTTP-запроса. Middleware в main.py
+# открывает счётчик, события движка увеличивают его. Контекст переносится
+# и в пул потоков (run_in_threadpool), и в run_sync асинхронной сессии.
+
+logger = logging.getLogger(__name__)
+
+# Отдавать число запросов и время в БД заголовками X-DB-Queries / X-DB-Time-Ms
+QUERY_HEADERS = os.environ.get("DB_QUERY_HEADERS", "0") == "1"
+# Запросы дольше порога пишутся в лог с маршрутом, мс (0 — выключено)
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "500"))
+# Проверки для разработки и тестов: off, warn (предупреждение в лог) или raise (ошибка 500)
+QUERY_CHECKS = os.environ.get("DB_QUERY_CHECKS", "off")
+# Бюджет SQL-запросов на HTTP-запрос для маршрутов, где он не объявлен через query_budget
+DEFAULT_BUDGET = int(os.environ.get("DB_QUERY_BUDGET", "20"))
+# Сколько раз один и тот же запрос (с точностью до параметров) считается признаком N+1
+REPEAT_LIMIT = int(os.environ.get("DB_REPEATED_QUERY_LIMIT", "5"))
+
+if QUERY_CHECKS not in ("off", "warn", "raise"):
+    raise ValueError(f"DB_QUERY_CHECKS должен быть off, warn или raise, а не {QUERY_CHECKS!r}")
+
+class QueryCheckError(RuntimeError):
+    """Маршрут превысил бюджет запросов или повторяет один запрос (DB_QUERY_CHECKS=raise)"""
+
+class QueryStats:
+    __slots__ = ("count", "duration", "route", "budget", "shapes", "reported")
+
+    def __init__(self, route: str = None):
+        self.count = 0
+        self.duration = 0.0
+        self.route = route
+        self.budget = DEFAULT_BUDGET
+        self.shapes = Counter()
+        self.reported = set()
+
+_current: ContextVar[QueryStats] = ContextVar("query_stats", default=None)
+
+def current():
+    """Счётчик текущего HTTP-запроса или None вне запроса"""
+    return _current.get()
+
+def start(route: str = None):
+    stats = QueryStats(route)
+    return stats, _current.set(stats)
+
+def finish(token):
+    _current.reset(token)
+
+def query_budget(limit: int):
+    """
+    Зависимость маршрута с объявленным числом SQL-запросов на вызов (вместе
+    с загрузкой пользователя при авторизации):
+
+        @router.get("/{request_id}", dependencies=[Depends(query_budget(3))])
+    """
+    async def declare_budget():
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = limit
+    return declare_budget
+
+# Списки параметров (IN с разным числом значений) сворачиваются в один
+_PLACEHOLDERS = re.compile(r"(?:%\(\w+\)s|%s|\?|\$\d+)(?:\s*,\s*(?:%\(\w+\)s|%s|\?|\$\d+))*")
+
+def statement_shape(statement: str) -> str:
+    """Текст запроса без значений параметров и лишних пробелов"""
+    return " ".join(_PLACEHOLDERS.sub("?", statement).split())
+
+def short_shape(shape: str) -> str:
+    """Для сообщений: список колонок SELECT не нужен, важны таблица и условие"""
+    return re.sub(r"^SELECT .+? FROM ", "SELECT ... FROM ", shape, count=1)[:300]
+
+def _violation(stats, kind, message):
+    if QUERY_CHECKS == "raise":
+        raise QueryCheckError(message)
+    # Одно предупреждение на нарушение за HTTP-запрос
+    if kind not in stats.reported:
+        stats.reported.add(kind)
+        logger.warning(message)
+
+def _check(stats, shape):
+    if stats.budget is not None and stats.count > stats.budget:
+        _violation(stats, "budget", f"{stats.route}: {stats.count} SQL-запросов при бюджете {stats.budget}")
+    stats.shapes[shape] += 1
+    if stats.shapes[shape] >= REPEAT_LIMIT:
+        _violation(stats, shape, f"{stats.route}: запрос повторён {stats.shapes[shape]} раз (N+1?): {short_shape(shape)}")
+
+# Время начала хранится в контексте выполнения, а не в соединении: для запроса,
+# завершившегося ошибкой, after_cursor_execute не вызывается, и в соединении
+# из пула остался бы лишний элемент
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _current.get()
+    shape = None
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        shape = statement_shape(statement)
+        route = stats.route if stats is not None else "вне HTTP-запроса"
+        logger.warning(f"Медленный SQL-запрос {elapsed * 1000:.0f} мс [{route}]: {shape[:1000]}")
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+        if QUERY_CHECKS != "off":
+            _check(stats, shape or statement_shape(statement))
+
+def install(engine):
+    """Подписать синхронный движок (для асинхронного — async_engine.sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
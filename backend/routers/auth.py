@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from .. import schemas, models
-from ..auth import create_access_token, verify_password, get_db, get_current_user
-from ..crud import get_user_by_login
+from .. import schemas
+from ..database import AnySession, get_db, run_db
+from ..auth import (create_access_token, verify_password, get_current_user,
+                    require_roles, principal_cache, Principal)
+from ..crud import get_user_by_login, get_user
+from ..querystats import query_budget
 
 router = APIRouter()
 
 @router.post("/login", response_model=schemas.TokenOut)
-def login(form: schemas.LoginIn, db: Session = Depends(get_db)):
-    user = get_user_by_login(db, form.login)
+async def login(form: schemas.LoginIn, db: AnySession = Depends(get_db)):
+    user = await run_db(db, get_user_by_login, form.login)
     if not user:
         raise HTTPException(status_code=400, detail="Пользователь не найден")
     
@@ -24,13 +26,23 @@ def login(form: schemas.LoginIn, db: Session = Depends(get_db)):
         "user_id": user.user_id
     }
 
-@router.get("/me")
-def get_current_user_info(current_user: models.User = Depends(get_current_user)):
+@router.get("/me", dependencies=[Depends(query_budget(2))])
+async def get_current_user_info(current_user: Principal = Depends(get_current_user),
+                                db: AnySession = Depends(get_db)):
     """Получить информацию о текущем пользователе"""
+    # В кэше только данные для проверки прав, профиль читаем из БД
+    user = await run_db(db, get_user, current_user.user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
     return {
-        "user_id": current_user.user_id,
-        "login": current_user.login,
-        "fio": current_user.fio,
-        "phone": current_user.phone,
-        "user_type": current_user.user_type
-    }
\ No newline at end of file
+        "user_id": user.user_id,
+        "login": user.login,
+        "fio": user.fio,
+        "phone": user.phone,
+        "user_type": user.user_type
+    }
+
+@router.get("/principal-cache")
+def principal_cache_stats(current=Depends(require_roles('Менеджер'))):
+    """Счётчики кэша пользователей (попадания, промахи, вытеснения)"""
+    return principal_cache.stats()
\ No newline at end of file
@@ -1,66 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import Optional, List
 from datetime import date
-from .. import models, schemas, database
-from ..auth import get_current_user
+from .. import models, schemas, stats, fastjson
+from ..database import AnySession, get_db, run_db
+from ..auth import get_current_user, Principal
+from ..conditional import conditional, row_etag, requests_etag, comments_etag
+from ..crud import REQUEST_SORT_KEYS
+from ..pagination import paginate
+from ..querystats import query_budget
 
 router = APIRouter()
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.get("/my-requests", response_model=List[schemas.RequestOut])
-def get_my_requests(
-    skip: int = 0,
-    limit: int = 100,
-    status: Optional[str] = Query(None, description="Фильтр по статусу"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
-):
-    """Получить заявки текущего пользователя (клиента)"""
-    if current_user.user_type != "Заказчик":
-        raise HTTPException(status_code=403, detail="Только для заказчиков")
-    
-    query = db.query(models.Request).filter(models.Request.client_id == current_user.user_id)
+def _get_client_requests(db: Session, client_id: int, status: Optional[str],
+                         sort: str, cursor: Optional[str], limit: int, columns=None):
+    query = db.query(*columns) if columns else db.query(models.Request)
+    query = query.filter(models.Request.client_id == client_id)
     
     if status:
         query = query.filter(models.Request.request_status == status)
     
-    return query.offset(skip).limit(limit).all()
+    return paginate(query, REQUEST_SORT_KEYS[sort], cursor=cursor, limit=limit)
 
-@router.post("/my-requests", response_model=schemas.RequestOut)
-def create_my_request(
-    request: schemas.RequestCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+def _get_client_request(db: Session, client_id: int, request_id: int):
+    return db.query(models.Request).filter(
+        models.Request.request_id == request_id,
+        models.Request.client_id == client_id
+    ).first()
+
+def _get_client_request_comments(db: Session, client_id: int, request_id: int):
+    # Проверяем, что заявка принадлежит пользователю
+    if _get_client_request(db, client_id, request_id) is None:
+        return None
+    
+    # Получаем комментарии к этой заявке
+    return db.query(models.Comment).filter(
+        models.Comment.request_id == request_id
+    ).all()
+
+@router.get("/my-requests", response_model=List[schemas.RequestOut], dependencies=[Depends(query_budget(2))])
+async def get_my_requests(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    sort: str = Query("request_id", pattern="^(request_id|start_date)$"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    if_none_match: Optional[str] = Header(None),
+    db: AnySession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
-    """Создать новую заявку для текущего пользователя"""
+    """Получить заявки текущего пользователя (клиента)"""
     if current_user.user_type != "Заказчик":
         raise HTTPException(status_code=403, detail="Только для заказчиков")
     
-    # Устанавливаем текущего пользователя как клиента
-    request_data = request.dict()
-    request_data["client_id"] = current_user.user_id
-    
-    # Проверяем и устанавливаем статус по умолчанию
-    if not request_data.get("request_status"):
-        request_data["request_status"] = "Новая заявка"
-    
-    # Проверяем дату начала
-    if not request_data.get("start_date"):
-        request_data["start_date"] = date.today()
-    
+    fast = fastjson.FAST_JSON
+    try:
+        rows, next_cursor = await run_db(db, _get_client_requests, current_user.user_id, status,
+                                         sort=sort, cursor=cursor, limit=limit,
+                                         columns=fastjson.REQUEST_COLUMNS if fast else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return conditional(response, requests_etag(rows, next_cursor), if_none_match=if_none_match) or (
+        fastjson.json_response(rows, fastjson.REQUEST_FIELDS, response) if fast else rows)
+
+def _create_client_request(db: Session, request_data: dict):
     try:
         # Создаем заявку
         db_request = models.Request(**request_data)
         db.add(db_request)
         db.flush()  # Получаем ID без commit
+        stats.apply_request_change(db, new=stats.snapshot(db_request))
         
         # Фиксируем изменения
         db.commit()
@@ -85,6 +97,7 @@ def create_my_request(
                 # Пробуем снова создать заявку
                 db_request = models.Request(**request_data)
                 db.add(db_request)
+                stats.apply_request_change(db, new=stats.snapshot(db_request))
                 db.commit()
                 db.refresh(db_request)
                 return db_request
@@ -101,48 +114,66 @@ def create_my_request(
                 detail=f"Ошибка при создании заявки: {str(e)}"
             )
 
-@router.get("/my-requests/{request_id}", response_model=schemas.RequestOut)
-def get_my_request_detail(
+@router.post("/my-requests", response_model=schemas.RequestOut)
+async def create_my_request(
+    request: schemas.RequestCreate,
+    db: AnySession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Создать новую заявку для текущего пользователя"""
+    if current_user.user_type != "Заказчик":
+        raise HTTPException(status_code=403, detail="Только для заказчиков")
+    
+    # Устанавливаем текущего пользователя как клиента
+    request_data = request.dict()
+    request_data["client_id"] = current_user.user_id
+    
+    # Проверяем и устанавливаем статус по умолчанию
+    if not request_data.get("request_status"):
+        request_data["request_status"] = "Новая заявка"
+    
+    # Проверяем дату начала
+    if not request_data.get("start_date"):
+        request_data["start_date"] = date.today()
+    
+    return await run_db(db, _create_client_request, request_data)
+
+@router.get("/my-requests/{request_id}", response_model=schemas.RequestOut, dependencies=[Depends(query_budget(2))])
+async def get_my_request_detail(
     request_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AnySession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить детали конкретной заявки пользователя"""
     if current_user.user_type != "Заказчик":
         raise HTTPException(status_code=403, detail="Только для заказчиков")
     
-    request = db.query(models.Request).filter(
-        models.Request.request_id == request_id,
-        models.Request.client_id == current_user.user_id
-    ).first()
+    request = await run_db(db, _get_client_request, current_user.user_id, request_id)
     
     if not request:
         raise HTTPException(status_code=404, detail="Заявка не найдена или у вас нет доступа")
     
-    return request
+    etag = row_etag("request", request.request_id, request.version)
+    return conditional(response, etag, request.updated_at, if_none_match, if_modified_since) or request
 
-@router.get("/my-requests/{request_id}/comments", response_model=List[schemas.CommentOut])
-def get_my_request_comments(
+@router.get("/my-requests/{request_id}/comments", response_model=List[schemas.CommentOut], dependencies=[Depends(query_budget(3))])
+async def get_my_request_comments(
     request_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AnySession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить комментарии к заявке пользователя"""
     if current_user.user_type != "Заказчик":
         raise HTTPException(status_code=403, detail="Только для заказчиков")
     
-    # Проверяем, что заявка принадлежит пользователю
-    request = db.query(models.Request).filter(
-        models.Request.request_id == request_id,
-        models.Request.client_id == current_user.user_id
-    ).first()
+    comments = await run_db(db, _get_client_request_comments, current_user.user_id, request_id)
     
-    if not request:
+    if comments is None:
         raise HTTPException(status_code=404, detail="Заявка не найдена или у вас нет доступа")
     
-    # Получаем комментарии к этой заявке
-    comments = db.query(models.Comment).filter(
-        models.Comment.request_id == request_id
-    ).all()
-    
-    return comments
\ No newline at end of file
+    return conditional(response, comments_etag(comments), if_none_match=if_none_match) or comments
\ No newline at end of file
@@ -1,34 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from .. import crud, schemas, database
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import Optional
+from .. import crud, schemas, fastjson
+from ..conditional import conditional, row_etag, comments_etag
+from ..database import AnySession, get_db, run_db
+from ..querystats import query_budget
 
 router = APIRouter()
 
-def get_db():
-    db = database.SessionLocal()
+@router.get("/", response_model=list[schemas.CommentOut], dependencies=[Depends(query_budget(2))])
+async def read_comments(response: Response, limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None,
+                  if_none_match: Optional[str] = Header(None),
+                  db: AnySession = Depends(get_db)):
+    fast = fastjson.FAST_JSON
     try:
-        yield db
-    finally:
-        db.close()
-
-@router.get("/", response_model=list[schemas.CommentOut])
-def read_comments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_comments(db, skip=skip, limit=limit)
+        rows, next_cursor = await run_db(db, crud.get_comments, limit=limit, cursor=cursor,
+                                         columns=fastjson.COMMENT_COLUMNS if fast else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return conditional(response, comments_etag(rows, next_cursor), if_none_match=if_none_match) or (
+        fastjson.json_response(rows, fastjson.COMMENT_FIELDS, response) if fast else rows)
 
 @router.get("/{comment_id}", response_model=schemas.CommentOut)
-def read_comment(comment_id: int, db: Session = Depends(get_db)):
-    db_comment = crud.get_comment(db, comment_id)
+async def read_comment(comment_id: int, response: Response,
+                       if_none_match: Optional[str] = Header(None),
+                       if_modified_since: Optional[str] = Header(None),
+                       db: AnySession = Depends(get_db)):
+    db_comment = await run_db(db, crud.get_comment, comment_id)
     if db_comment is None:
         raise HTTPException(status_code=404, detail="Comment not found")
-    return db_comment
+    etag = row_etag("comment", db_comment.comment_id, db_comment.version)
+    return conditional(response, etag, db_comment.updated_at, if_none_match, if_modified_since) or db_comment
 
 @router.post("/", response_model=schemas.CommentOut)
-def create_comment(comment: schemas.CommentCreate, db: Session = Depends(get_db)):
-    return crud.create_comment(db, comment)
+async def create_comment(comment: schemas.CommentCreate, db: AnySession = Depends(get_db)):
+    return await run_db(db, crud.create_comment, comment)
 
 @router.delete("/{comment_id}")
-def delete_comment(comment_id: int, db: Session = Depends(get_db)):
-    db_comment = crud.delete_comment(db, comment_id)
+async def delete_comment(comment_id: int, db: AnySession = Depends(get_db)):
+    db_comment = await run_db(db, crud.delete_comment, comment_id)
     if db_comment is None:
         raise HTTPException(status_code=404, detail="Comment not found")
     return {"detail": "Comment deleted"}
@@ -1,15 +1,170 @@
+import hashlib
 import io
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import qrcode
-from fastapi import APIRouter, Response, Depends
+import qrcode.image.svg
+from PIL import Image, ImageDraw, ImageFont
+from fastapi import APIRouter, Response, Depends, Query, Header, HTTPException
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from .. import crud, models, schemas
 from ..auth import require_roles
+from ..database import AnySession, get_db, run_db
 
 FEEDBACK_URL = "https://docs.google.com/forms/d/e/1FAIpQLSdhZcExx6LSIXxk0ub55mSu-WIh23WYdGG9HY5EZhLDo7P8eA/viewform?usp=sf_link"
 
+# Число вариантов (содержимое, размер, уровень коррекции, формат), хранимых в памяти
+QR_CACHE_SIZE = int(os.environ.get("QR_CACHE_SIZE", "256"))
+
+ERROR_CORRECTION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+# Метки заявок: ссылка ведёт на страницу заявки во фронтенде
+FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://127.0.0.1:5000")
+QR_LABELS_MAX = int(os.environ.get("QR_LABELS_MAX", "1000"))
+QR_LABEL_WORKERS = int(os.environ.get("QR_LABEL_WORKERS", str(os.cpu_count() or 1)))
+QR_LABEL_FONT = os.environ.get("QR_LABEL_FONT", "DejaVuSans.ttf")
+LABEL_MEDIA_TYPES = {"pdf": "application/pdf", "zip": "application/zip"}
+
 router = APIRouter()
 
-@router.get("/feedback", response_class=Response)
-def feedback_qr(current=Depends(require_roles('Оператор','Специалист','Менеджер','Менеджер по качеству','Заказчик'))):
-    img = qrcode.make(FEEDBACK_URL)
+def render_qr(data: str, size: int = 10, ec: str = "M", fmt: str = "png") -> bytes:
+    """Отрисовать QR-код: size — размер модуля в пикселях"""
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECTION[ec], box_size=size, border=4)
+    qr.add_data(data)
+    qr.make(fit=True)
+    buf = io.BytesIO()
+    if fmt == "svg":
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buf)
+    else:
+        qr.make_image().save(buf, format="PNG")
+    return buf.getvalue()
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def cached_qr(data: str, size: int, ec: str, fmt: str):
+    """Байты и строгий ETag варианта QR-кода"""
+    content = render_qr(data, size, ec, fmt)
+    return content, '"' + hashlib.sha256(content).hexdigest() + '"'
+
+def qr_response(data: str, size: int, ec: str, fmt: str, if_none_match: Optional[str]) -> Response:
+    content, etag = cached_qr(data, size, ec, fmt)
+    headers = {
+        "ETag": etag,
+        # Один и тот же запрос всегда даёт те же байты
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+@lru_cache(maxsize=None)
+def _label_font(size: int):
+    try:
+        return ImageFont.truetype(QR_LABEL_FONT, size)
+    except OSError:
+        return ImageFont.load_default()
+
+def render_label(item) -> bytes:
+    """PNG-метка заявки: QR со ссылкой на заявку, номер и модель под ним"""
+    request_id, model = item
+    # Фиксированная маска: подбор лучшей из восьми занимает большую часть времени отрисовки
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=6, border=4, mask_pattern=0)
+    qr.add_data(f"{FRONTEND_URL}/requests/{request_id}")
+    qr.make(fit=True)
+    code = qr.make_image().get_image().convert("L")
+
+    width = max(code.width, 240)
+    label = Image.new("L", (width, code.height + 56), 255)
+    label.paste(code, ((width - code.width) // 2, 0))
+    draw = ImageDraw.Draw(label)
+    draw.text((width // 2, code.height + 2), f"Заявка №{request_id}", fill=0, anchor="mt", font=_label_font(20))
+    font = _label_font(16)
+    if draw.textlength(model, font=font) > width - 8:
+        while model and draw.textlength(model + "…", font=font) > width - 8:
+            model = model[:-1]
+        model += "…"
+    draw.text((width // 2, code.height + 30), model, fill=0, anchor="mt", font=font)
+
     buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return Response(content=buf.getvalue(), media_type="image/png")
+    label.save(buf, format="PNG")
+    return buf.getvalue()
+
+_label_pool = None
+_label_pool_lock = threading.Lock()
+
+def get_label_pool() -> ProcessPoolExecutor:
+    """Пул процессов для отрисовки меток (создаётся при первом обращении)"""
+    global _label_pool
+    with _label_pool_lock:
+        if _label_pool is None:
+            _label_pool = ProcessPoolExecutor(max_workers=QR_LABEL_WORKERS)
+        return _label_pool
+
+def shutdown_label_pool():
+    global _label_pool
+    with _label_pool_lock:
+        if _label_pool is not None:
+            _label_pool.shutdown()
+            _label_pool = None
+
+def render_labels(rows, fmt: str) -> bytes:
+    """Собрать метки в многостраничный PDF (метка на страницу) или ZIP из PNG"""
+    chunksize = max(1, len(rows) // (QR_LABEL_WORKERS * 4))
+    images = list(get_label_pool().map(render_label, rows, chunksize=chunksize))
+
+    buf = io.BytesIO()
+    if fmt == "zip":
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            for (request_id, _), png in zip(rows, images):
+                zf.writestr(f"request_{request_id}.png", png)
+    else:
+        # Чёрно-белые страницы: без JPEG-артефактов на QR и в разы меньше файл
+        pages = [Image.open(io.BytesIO(png)).convert("1", dither=Image.Dither.NONE) for png in images]
+        pages[0].save(buf, format="PDF", save_all=True, append_images=pages[1:], resolution=150)
+    return buf.getvalue()
+
+def _label_rows(db, data: schemas.QRLabelsIn):
+    query = crud.search_requests_query(db, status=data.status, tech_type=data.tech_type,
+                                       client_id=data.client_id, master_id=data.master_id)
+    if data.request_ids is not None:
+        query = query.filter(models.Request.request_id.in_(data.request_ids))
+    rows = query.with_entities(
+        models.Request.request_id, models.Request.climate_tech_model
+    ).order_by(models.Request.request_id).limit(QR_LABELS_MAX + 1).all()
+    return [tuple(r) for r in rows]
+
+@router.get("/feedback", response_class=Response)
+def feedback_qr(size: int = Query(10, ge=1, le=40, description="Размер модуля, px"),
+                ec: str = Query("M", pattern="^[LMQH]$", description="Уровень коррекции ошибок"),
+                format: str = Query("png", pattern="^(png|svg)$"),
+                if_none_match: Optional[str] = Header(None),
+                current=Depends(require_roles('Оператор','Специалист','Менеджер','Менеджер по качеству','Заказчик'))):
+    return qr_response(FEEDBACK_URL, size, ec, format, if_none_match)
+
+@router.get("/cache")
+def qr_cache_stats(current=Depends(require_roles('Менеджер'))):
+    """Счётчики кэша QR-кодов"""
+    return cached_qr.cache_info()._asdict()
+
+@router.post("/labels", response_class=Response)
+async def request_labels(data: schemas.QRLabelsIn, db: AnySession = Depends(get_db),
+                         current=Depends(require_roles('Оператор','Специалист','Менеджер','Менеджер по качеству'))):
+    """QR-метки заявок одним файлом: по списку request_ids или по фильтру"""
+    rows = await run_db(db, _label_rows, data)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Заявки не найдены")
+    if len(rows) > QR_LABELS_MAX:
+        raise HTTPException(status_code=400, detail=f"Не более {QR_LABELS_MAX} меток за раз, уточните фильтр")
+
+    content = await run_in_threadpool(render_labels, rows, data.format)
+    return Response(content=content, media_type=LABEL_MEDIA_TYPES[data.format],
+                    headers={"Content-Disposition": f'attachment; filename="qr-labels.{data.format}"'})
\ No newline at end of file
@@ -1,66 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from typing import Optional
+from sqlalchemy import func
+from typing import Optional, List, Any, Dict
+from pydantic import ValidationError
 from datetime import date
-from .. import models, crud, schemas, database
-from ..auth import get_current_user, require_roles
+from .. import models, crud, schemas, stats, export, fastjson
+from ..conditional import conditional, request_etag, requests_etag, comments_etag
+from ..database import AnySession, get_db, run_db
+from ..auth import get_current_user, require_roles, Principal
+from ..querystats import query_budget
 
 router = APIRouter()
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Максимальный размер пачки POST /requests/bulk
+BULK_MAX = 1000
 
-@router.get("/", response_model=list[schemas.RequestOut])
-def read_requests(skip: int = 0, limit: int = 100, 
-                  db: Session = Depends(get_db), 
-                  current_user: models.User = Depends(get_current_user)):
+@router.get("/", response_model=list[schemas.RequestExpanded], response_model_exclude_unset=True, dependencies=[Depends(query_budget(3))])
+async def read_requests(response: Response,
+                  limit: int = Query(100, ge=1, le=500),
+                  cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+                  sort: str = Query("request_id", pattern="^(request_id|start_date)$"),
+                  expand: Optional[str] = Query(None, description="Связи: client,master,comments"),
+                  if_none_match: Optional[str] = Header(None),
+                  db: AnySession = Depends(get_db), 
+                  current_user: Principal = Depends(get_current_user)):
     """Получить все заявки (доступно сотрудникам)"""
     if current_user.user_type == "Заказчик":
         raise HTTPException(status_code=403, detail="Заказчикам доступны только свои заявки")
-    return crud.get_requests(db, skip=skip, limit=limit)
+    try:
+        expand = crud.parse_expand(expand)
+        fast = fastjson.FAST_JSON and not expand
+        rows, next_cursor = await run_db(db, crud.get_requests, limit=limit, cursor=cursor, sort=sort,
+                                         expand=expand, columns=fastjson.REQUEST_COLUMNS if fast else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    etag = requests_etag(rows, next_cursor, expand)
+    return conditional(response, etag, if_none_match=if_none_match) or (
+        fastjson.json_response(rows, fastjson.REQUEST_FIELDS, response) if fast else rows)
 
 # ⚠️ ВАЖНО: Этот маршрут должен быть ВЫШЕ /{request_id}
-@router.get("/search", response_model=list[schemas.RequestOut])
-def search_requests(
+@router.get("/search", response_model=list[schemas.RequestExpanded], response_model_exclude_unset=True, dependencies=[Depends(query_budget(3))])
+async def search_requests(
+    response: Response,
     number: Optional[int] = Query(None, description="Номер заявки"),
     status: Optional[str] = Query(None, description="Статус"),
     tech_type: Optional[str] = Query(None, description="Тип оборудования"),
     client_id: Optional[int] = Query(None, description="ID клиента"),
     master_id: Optional[int] = Query(None, description="ID мастера"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    q: Optional[str] = Query(None, max_length=200, description="Текст: описание проблемы или модель"),
+    limit: int = Query(50, ge=1, le=200, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    sort: str = Query("start_date", pattern="^(request_id|start_date)$"),
+    expand: Optional[str] = Query(None, description="Связи: client,master,comments"),
+    if_none_match: Optional[str] = Header(None),
+    db: AnySession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Поиск заявок"""
     if current_user.user_type == "Заказчик":
         raise HTTPException(status_code=403, detail="Заказчикам доступен только поиск по своим заявкам через /client/my-requests")
     
-    q = db.query(models.Request)
-    if number is not None:
-        q = q.filter(models.Request.request_id == number)
-    if status is not None:
-        q = q.filter(models.Request.request_status == status)
-    if tech_type is not None:
-        q = q.filter(models.Request.climate_tech_type == tech_type)
-    if client_id is not None:
-        q = q.filter(models.Request.client_id == client_id)
-    if master_id is not None:
-        q = q.filter(models.Request.master_id == master_id)
-    results = q.all()
-    if not results:
-        # Возвращаем пустой список вместо ошибки
-        return []
-    return results
+    try:
+        expand = crud.parse_expand(expand)
+        fast = fastjson.FAST_JSON and not expand
+        results, next_cursor = await run_db(db, crud.search_requests, limit=limit, cursor=cursor, sort=sort,
+            number=number, status=status, tech_type=tech_type,
+            client_id=client_id, master_id=master_id, q=q, expand=expand,
+            columns=fastjson.REQUEST_COLUMNS if fast else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Пустой список вместо ошибки, если ничего не найдено
+    etag = requests_etag(results, next_cursor, expand)
+    return conditional(response, etag, if_none_match=if_none_match) or (
+        fastjson.json_response(results, fastjson.REQUEST_FIELDS, response) if fast else results)
 
-@router.get("/{request_id}", response_model=schemas.RequestOut)
-def read_request(request_id: int, db: Session = Depends(get_db),
-                 current_user: models.User = Depends(get_current_user)):
-    """Получить детали заявки"""
-    db_request = crud.get_request(db, request_id)
+@router.get("/export")
+async def export_requests(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    number: Optional[int] = Query(None, description="Номер заявки"),
+    status: Optional[str] = Query(None, description="Статус"),
+    tech_type: Optional[str] = Query(None, description="Тип оборудования"),
+    client_id: Optional[int] = Query(None, description="ID клиента"),
+    master_id: Optional[int] = Query(None, description="ID мастера"),
+    q: Optional[str] = Query(None, max_length=200, description="Текст: описание проблемы или модель"),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Выгрузить заявки (с фильтрами поиска) потоком в CSV или NDJSON"""
+    if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
+        raise HTTPException(status_code=403, detail="Выгрузка доступна только менеджерам")
+    
+    stmt = export.export_statement(q=q, number=number, status=status, tech_type=tech_type,
+                                   client_id=client_id, master_id=master_id)
+    return StreamingResponse(
+        export.stream_export(stmt, format),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="requests.{format}"'}
+    )
+
+@router.get("/{request_id}", response_model=schemas.RequestExpanded, response_model_exclude_unset=True, dependencies=[Depends(query_budget(3))])
+async def read_request(request_id: int, response: Response,
+                 expand: Optional[str] = Query(None, description="Связи: client,master,comments"),
+                 comments_cursor: Optional[str] = Query(None, description="Курсор комментариев (comments_next_cursor)"),
+                 if_none_match: Optional[str] = Header(None),
+                 if_modified_since: Optional[str] = Header(None),
+                 db: AnySession = Depends(get_db),
+                 current_user: Principal = Depends(get_current_user)):
+    """
+    Получить детали заявки. С ?expand=client,master,comments заявка отдаётся
+    вместе с клиентом, специалистом и первыми комментариями с авторами (два
+    запроса к БД); следующие комментарии — с ?comments_cursor=<comments_next_cursor>.
+    """
+    try:
+        expand = crud.parse_expand(expand)
+        db_request = await run_db(db, crud.get_request, request_id, expand, comments_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if db_request is None:
         raise HTTPException(status_code=404, detail="Request not found")
     
@@ -68,127 +128,180 @@ def read_request(request_id: int, db: Session = Depends(get_db),
     if current_user.user_type == "Заказчик" and db_request.client_id != current_user.user_id:
         raise HTTPException(status_code=403, detail="Нет доступа к этой заявке")
     
-    return db_request
+    # Изменения связанных строк не двигают updated_at заявки, поэтому
+    # для развёрнутого ответа остаётся только ETag
+    last_modified = None if expand else db_request.updated_at
+    etag = request_etag(db_request, expand)
+    return conditional(response, etag, last_modified, if_none_match, if_modified_since) or db_request
+
+@router.get("/{request_id}/comments", response_model=list[schemas.CommentOut], dependencies=[Depends(query_budget(3))])
+async def read_request_comments(request_id: int, response: Response,
+                          limit: int = Query(100, ge=1, le=500),
+                          cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+                          if_none_match: Optional[str] = Header(None),
+                          db: AnySession = Depends(get_db),
+                          current_user: Principal = Depends(get_current_user)):
+    """Получить комментарии к заявке (доступно сотрудникам)"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Заказчикам доступны комментарии через /client/my-requests")
+    if await run_db(db, crud.get_request, request_id) is None:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    try:
+        rows, next_cursor = await run_db(db, crud.get_request_comments, request_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return conditional(response, comments_etag(rows, next_cursor), if_none_match=if_none_match) or rows
 
 @router.post("/", response_model=schemas.RequestOut)
-def create_request(request: schemas.RequestCreate, db: Session = Depends(get_db),
-                   current_user: models.User = Depends(get_current_user)):
+async def create_request(request: schemas.RequestCreate, db: AnySession = Depends(get_db),
+                   current_user: Principal = Depends(get_current_user)):
     """Создать новую заявку"""
     if current_user.user_type == "Заказчик":
         raise HTTPException(status_code=403, detail="Заказчики создают заявки через /client/my-requests")
-    return crud.create_request(db, request)
+    return await run_db(db, crud.create_request, request)
+
+@router.post("/bulk", response_model=schemas.BulkCreateOut)
+async def create_requests_bulk(items: List[Dict[str, Any]] = Body(..., description="Массив RequestCreate"),
+                               db: AnySession = Depends(get_db),
+                               current_user: Principal = Depends(get_current_user)):
+    """Создать пачку заявок; ошибки сообщаются по каждой позиции, остальные заявки создаются"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Заказчики создают заявки через /client/my-requests")
+    if len(items) > BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"Не более {BULK_MAX} заявок за раз")
+    
+    results = [None] * len(items)
+    valid, positions = [], []
+    for i, item in enumerate(items):
+        try:
+            valid.append(schemas.RequestCreate.model_validate(item))
+            positions.append(i)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+            results[i] = schemas.BulkItemResult(index=i, ok=False, errors=errors)
+    
+    created, failed = await run_db(db, crud.create_requests, valid) if valid else ({}, {})
+    for j, i in enumerate(positions):
+        if j in created:
+            results[i] = schemas.BulkItemResult(index=i, ok=True, request=created[j])
+        else:
+            results[i] = schemas.BulkItemResult(index=i, ok=False, errors=failed[j])
+    
+    return schemas.BulkCreateOut(created=len(created), failed=len(items) - len(created), results=results)
+
+@router.post("/bulk-update", response_model=schemas.BulkUpdateOut)
+async def update_requests_bulk(data: schemas.BulkUpdateIn, db: AnySession = Depends(get_db),
+                               current_user: Principal = Depends(get_current_user)):
+    """Изменить статус, специалиста или дату завершения у набора заявок одним UPDATE"""
+    if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    if data.request_ids is None and data.filter is None:
+        raise HTTPException(status_code=400, detail="Укажите request_ids или filter")
+    # Пустой фильтр дал бы UPDATE без условий — по всем заявкам
+    filters = data.filter.dict(exclude_none=True) if data.filter else None
+    if filters == {}:
+        raise HTTPException(status_code=400, detail="Фильтр пуст: укажите хотя бы одно условие")
+    patch = data.patch.dict(exclude_unset=True)
+    if not patch:
+        raise HTTPException(status_code=400, detail="Не указаны изменения")
+    
+    try:
+        result = await run_db(db, crud.update_requests, patch, request_ids=data.request_ids,
+                              filters=filters, limit=BULK_MAX)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=400, detail=f"Под фильтр попадает больше {BULK_MAX} заявок, уточните его")
+    
+    updated, missing = result
+    results = [schemas.BulkUpdateItem(request_id=r.request_id, ok=True, request=r) for r in updated]
+    results += [schemas.BulkUpdateItem(request_id=i, ok=False, errors=["Заявка не найдена"]) for i in missing]
+    return schemas.BulkUpdateOut(updated=len(updated), failed=len(missing), results=results)
 
 @router.put("/{request_id}", response_model=schemas.RequestOut)
-def update_request(request_id: int, request_update: schemas.RequestUpdate, 
-                   db: Session = Depends(get_db),
-                   current_user: models.User = Depends(get_current_user)):
+async def update_request(request_id: int, request_update: schemas.RequestUpdate, 
+                   db: AnySession = Depends(get_db),
+                   current_user: Principal = Depends(get_current_user)):
     """Обновить заявку"""
     if current_user.user_type == "Заказчик":
         raise HTTPException(status_code=403, detail="Заказчики не могут редактировать заявки")
     
-    db_request = crud.update_request(db, request_id, request_update)
+    db_request = await run_db(db, crud.update_request, request_id, request_update)
     if db_request is None:
         raise HTTPException(status_code=404, detail="Request not found")
     return db_request
 
 @router.delete("/{request_id}")
-def delete_request(request_id: int, db: Session = Depends(get_db),
-                   current_user: models.User = Depends(get_current_user)):
+async def delete_request(request_id: int, db: AnySession = Depends(get_db),
+                   current_user: Principal = Depends(get_current_user)):
     """Удалить заявку"""
     if current_user.user_type != "Менеджер":
         raise HTTPException(status_code=403, detail="Только менеджеры могут удалять заявки")
     
-    deleted = crud.delete_request(db, request_id)
+    deleted = await run_db(db, crud.delete_request, request_id)
     if deleted is None:
         raise HTTPException(status_code=404, detail="Заявка не найдена")
     return {"detail": "Удаление подтверждено: заявка удалена"}
 
 @router.post("/{request_id}/assign", response_model=schemas.RequestOut)
-def assign_specialist(request_id: int, data: schemas.AssignSpecialistIn, 
-                      db: Session = Depends(get_db),
-                      current_user: models.User = Depends(get_current_user)):
+async def assign_specialist(request_id: int, data: schemas.AssignSpecialistIn, 
+                      db: AnySession = Depends(get_db),
+                      current_user: Principal = Depends(get_current_user)):
     """Назначить специалиста на заявку"""
     if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
     
     upd = schemas.RequestUpdate(master_id=data.master_id)
-    db_request = crud.update_request(db, request_id, upd)
+    db_request = await run_db(db, crud.update_request, request_id, upd)
     if db_request is None:
         raise HTTPException(status_code=404, detail="Заявка не найдена")
     return db_request
 
 @router.post("/{request_id}/extend", response_model=schemas.RequestOut)
-def extend_deadline(request_id: int, data: schemas.ExtendDeadlineIn, 
-                    db: Session = Depends(get_db),
-                    current_user: models.User = Depends(get_current_user)):
+async def extend_deadline(request_id: int, data: schemas.ExtendDeadlineIn, 
+                    db: AnySession = Depends(get_db),
+                    current_user: Principal = Depends(get_current_user)):
     """Продлить срок выполнения заявки"""
     if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
     
     upd = schemas.RequestUpdate(completion_date=data.new_completion_date)
-    db_request = crud.update_request(db, request_id, upd)
+    db_request = await run_db(db, crud.update_request, request_id, upd)
     if db_request is None:
         raise HTTPException(status_code=404, detail="Заявка не найдена")
     return db_request
 
+def stats_scope(current_user) -> int:
+    """Область статистики: заказчику — только его заявки, сотрудникам — все"""
+    if current_user.user_type == "Заказчик":
+        return current_user.user_id
+    return stats.ALL_CLIENTS
+
+@router.get("/stats/summary", dependencies=[Depends(query_budget(2))])
+async def stats_summary(db: AnySession = Depends(get_db),
+                  current_user: Principal = Depends(get_current_user)):
+    """Получить всю статистику для панели одним запросом"""
+    return await run_db(db, stats.get_summary, stats_scope(current_user))
+
 @router.get("/stats/count")
-def stats_count(db: Session = Depends(get_db), 
-                current_user: models.User = Depends(get_current_user)):
+async def stats_count(db: AnySession = Depends(get_db), 
+                current_user: Principal = Depends(get_current_user)):
     """Получить статистику по количеству заявок"""
-    
-    if current_user.user_type == "Заказчик":
-        # Для заказчика - только его заявки
-        total = db.query(func.count(models.Request.request_id)).filter(
-            models.Request.client_id == current_user.user_id
-        ).scalar()
-        
-        done = db.query(func.count(models.Request.request_id)).filter(
-            and_(
-                models.Request.client_id == current_user.user_id,
-                models.Request.completion_date.isnot(None)
-            )
-        ).scalar()
-    else:
-        # Для сотрудников - все заявки
-        total = db.query(func.count(models.Request.request_id)).scalar()
-        
-        done = db.query(func.count(models.Request.request_id)).filter(
-            models.Request.completion_date.isnot(None)
-        ).scalar()
+    total, done, _, _ = await run_db(db, stats.get_totals, stats_scope(current_user))
     
     return {
-        "total_requests": total or 0, 
-        "completed_requests": done or 0
+        "total_requests": total, 
+        "completed_requests": done
     }
 
 @router.get("/stats/avg-time")
-def stats_avg_time(db: Session = Depends(get_db), 
-                   current_user: models.User = Depends(get_current_user)):
+async def stats_avg_time(db: AnySession = Depends(get_db), 
+                   current_user: Principal = Depends(get_current_user)):
     """Получить среднее время выполнения заявок"""
-    
-    if current_user.user_type == "Заказчик":
-        # Для заказчика - только его завершенные заявки
-        completed_requests = db.query(models.Request).filter(
-            and_(
-                models.Request.client_id == current_user.user_id,
-                models.Request.completion_date.isnot(None)
-            )
-        ).all()
-    else:
-        # Для сотрудников - все завершенные заявки
-        completed_requests = db.query(models.Request).filter(
-            models.Request.completion_date.isnot(None)
-        ).all()
-    
-    total_days = 0
-    count = 0
-    
-    for request in completed_requests:
-        if request.start_date and request.completion_date:
-            days = (request.completion_date - request.start_date).days
-            if days >= 0:  # Учитываем даже если 0 дней
-                total_days += days
-                count += 1
+    _, _, total_days, count = await run_db(db, stats.get_totals, stats_scope(current_user))
     
     avg_days_float = total_days / count if count > 0 else 0
     
@@ -199,69 +312,41 @@ def stats_avg_time(db: Session = Depends(get_db),
     }
 
 @router.get("/stats/by-problem-type")
-def stats_by_problem_type(db: Session = Depends(get_db), 
-                          current_user: models.User = Depends(get_current_user)):
+async def stats_by_problem_type(db: AnySession = Depends(get_db), 
+                          current_user: Principal = Depends(get_current_user)):
     """Получить статистику по типам проблем"""
-    
-    if current_user.user_type == "Заказчик":
-        # Для заказчика - только его заявки
-        rows = db.query(
-            models.Request.problem_description, 
-            func.count(models.Request.request_id)
-        ).filter(
-            models.Request.client_id == current_user.user_id
-        ).group_by(models.Request.problem_description).all()
-    else:
-        # Для сотрудников - все заявки
-        rows = db.query(
-            models.Request.problem_description, 
-            func.count(models.Request.request_id)
-        ).group_by(models.Request.problem_description).all()
-    
+    rows = await run_db(db, stats.get_buckets, "problem", stats_scope(current_user))
     return [{"problem": r[0], "count": r[1]} for r in rows]
 
 @router.get("/stats/by-tech")
-def stats_by_tech(db: Session = Depends(get_db), 
-                  current_user: models.User = Depends(get_current_user)):
+async def stats_by_tech(db: AnySession = Depends(get_db), 
+                  current_user: Principal = Depends(get_current_user)):
     """Получить статистику по типам оборудования"""
-    
-    if current_user.user_type == "Заказчик":
-        # Для заказчика - только его заявки
-        rows = db.query(
-            models.Request.climate_tech_type, 
-            func.count(models.Request.request_id)
-        ).filter(
-            models.Request.client_id == current_user.user_id
-        ).group_by(models.Request.climate_tech_type).all()
-    else:
-        # Для сотрудников - все заявки
-        rows = db.query(
-            models.Request.climate_tech_type, 
-            func.count(models.Request.request_id)
-        ).group_by(models.Request.climate_tech_type).all()
-    
+    rows = await run_db(db, stats.get_buckets, "tech", stats_scope(current_user))
     return [{"tech_type": r[0], "count": r[1]} for r in rows]
 
 # Импортируем case для debug эндпоинта
 from sqlalchemy import case
 
-@router.get("/debug/statuses")
-def debug_statuses(db: Session = Depends(get_db),
-                  current_user: models.User = Depends(get_current_user)):
-    """Отладочный эндпоинт - показывает все статусы"""
-    if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
-        raise HTTPException(status_code=403, detail="Недостаточно прав")
-    
+def _status_counts(db: Session):
     statuses = db.query(
         models.Request.request_status,
         func.count(models.Request.request_id),
         func.sum(case((models.Request.completion_date.isnot(None), 1), else_=0))
     ).group_by(models.Request.request_status).all()
     
-    all_requests = db.query(models.Request).all()
-    
+    # Итоги — из тех же групп, без загрузки всех заявок
     return {
         "status_counts": [{"status": s[0], "count": s[1], "completed": s[2]} for s in statuses],
-        "total_requests": len(all_requests),
-        "completed_requests": sum(1 for r in all_requests if r.completion_date is not None)
-    }
\ No newline at end of file
+        "total_requests": sum(s[1] for s in statuses),
+        "completed_requests": sum(s[2] or 0 for s in statuses)
+    }
+
+@router.get("/debug/statuses", dependencies=[Depends(query_budget(2))])
+async def debug_statuses(db: AnySession = Depends(get_db),
+                  current_user: Principal = Depends(get_current_user)):
+    """Отладочный эндпоинт - показывает все статусы"""
+    if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    
+    return await run_db(db, _status_counts)
\ No newline at end of file
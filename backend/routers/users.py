@@ -1,34 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from .. import crud, schemas, database
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Optional
+from .. import crud, schemas, fastjson
+from ..database import AnySession, get_db, run_db
 
 router = APIRouter()
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/", response_model=list[schemas.UserOut])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_users(db, skip=skip, limit=limit)
+async def read_users(response: Response, limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None,
+               db: AnySession = Depends(get_db)):
+    fast = fastjson.FAST_JSON
+    try:
+        rows, next_cursor = await run_db(db, crud.get_users, limit=limit, cursor=cursor,
+                                         columns=fastjson.USER_COLUMNS if fast else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return fastjson.json_response(rows, fastjson.USER_FIELDS, response) if fast else rows
 
 @router.get("/{user_id}", response_model=schemas.UserOut)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id)
+async def read_user(user_id: int, db: AnySession = Depends(get_db)):
+    db_user = await run_db(db, crud.get_user, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 @router.post("/", response_model=schemas.UserOut)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    return crud.create_user(db, user)
+async def create_user(user: schemas.UserCreate, db: AnySession = Depends(get_db)):
+    return await run_db(db, crud.create_user, user)
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.delete_user(db, user_id)
+async def delete_user(user_id: int, db: AnySession = Depends(get_db)):
+    db_user = await run_db(db, crud.delete_user, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return {"detail": "User deleted"}
@@ -37,17 +40,26 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
 from ..auth import require_roles
 
 @router.get("/", response_model=list[schemas.UserOut])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current=Depends(require_roles('Менеджер','Менеджер по качеству'))):
-    return crud.get_users(db, skip=skip, limit=limit)
+async def read_users(response: Response, limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None,
+               db: AnySession = Depends(get_db), current=Depends(require_roles('Менеджер','Менеджер по качеству'))):
+    fast = fastjson.FAST_JSON
+    try:
+        rows, next_cursor = await run_db(db, crud.get_users, limit=limit, cursor=cursor,
+                                         columns=fastjson.USER_COLUMNS if fast else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return fastjson.json_response(rows, fastjson.USER_FIELDS, response) if fast else rows
 
 @router.post("/", response_model=schemas.UserOut)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db), current=Depends(require_roles('Менеджер'))):
-    return crud.create_user(db, user)
+async def create_user(user: schemas.UserCreate, db: AnySession = Depends(get_db), current=Depends(require_roles('Менеджер'))):
+    return await run_db(db, crud.create_user, user)
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db), current=Depends(require_roles('Менеджер'))):
+async def delete_user(user_id: int, db: AnySession = Depends(get_db), current=Depends(require_roles('Менеджер'))):
     # подтверждение удаления будет на фронте
-    deleted = crud.delete_user(db, user_id)
+    deleted = await run_db(db, crud.delete_user, user_id)
     if deleted is None:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     return {"detail": "Пользователь удалён"}
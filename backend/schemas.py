@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from sqlalchemy import inspect
+from typing import Optional, List
 from datetime import date
 
 # ---------- Requests ----------
@@ -31,6 +32,59 @@ class RequestOut(RequestBase):
         from_attributes = True  # для Pydantic v2
 
 
+class BulkItemResult(BaseModel):
+    # Позиция во входном массиве и итог по ней
+    index: int
+    ok: bool
+    request: Optional[RequestOut] = None
+    errors: Optional[List[str]] = None
+
+class BulkCreateOut(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+class RequestPatch(BaseModel):
+    # null в master_id снимает специалиста, в completion_date — дату завершения;
+    # статус обязателен (NOT NULL), его можно только не передавать
+    master_id: Optional[int] = None
+    request_status: Optional[str] = None
+    completion_date: Optional[date] = None
+
+    @field_validator("request_status")
+    @classmethod
+    def status_not_null(cls, value):
+        if value is None:
+            raise ValueError("Статус заявки не может быть null")
+        return value
+
+class RequestFilterIn(BaseModel):
+    # Те же фильтры, что у /requests/search
+    number: Optional[int] = None
+    status: Optional[str] = None
+    tech_type: Optional[str] = None
+    client_id: Optional[int] = None
+    master_id: Optional[int] = None
+
+class BulkUpdateIn(BaseModel):
+    # Либо явный список заявок, либо фильтр
+    request_ids: Optional[List[int]] = Field(None, max_length=1000)
+    filter: Optional[RequestFilterIn] = None
+    patch: RequestPatch
+
+class BulkUpdateItem(BaseModel):
+    request_id: int
+    ok: bool
+    request: Optional[RequestOut] = None
+    errors: Optional[List[str]] = None
+
+class BulkUpdateOut(BaseModel):
+    updated: int
+    failed: int
+    results: List[BulkUpdateItem]
+
+
 # ---------- Users ----------
 class UserBase(BaseModel):
     fio: str
@@ -69,6 +123,46 @@ class CommentOut(CommentBase):
         from_attributes = True
 
 
+# ---------- Expand ----------
+def loaded_attributes(cls, obj):
+    """
+    ORM-объект -> словарь только загруженных атрибутов. Незагруженные связи
+    не читаются (нет ленивых запросов) и остаются неустановленными, поэтому
+    с response_model_exclude_unset в ответ не попадают.
+    """
+    state = inspect(obj, raiseerr=False)
+    if state is None or not hasattr(state, "unloaded"):
+        return obj
+    unloaded = state.unloaded
+    # hasattr — для полей вне маппинга (comments_next_cursor), заданных не всегда
+    return {name: getattr(obj, name) for name in cls.model_fields
+            if name not in unloaded and hasattr(obj, name)}
+
+class UserBrief(BaseModel):
+    # Без телефона и логина: развёрнутую заявку видит и заказчик
+    user_id: int
+    fio: str
+    user_type: str
+
+    class Config:
+        from_attributes = True
+
+class CommentExpanded(CommentOut):
+    master: Optional[UserBrief] = None
+
+    _loaded = model_validator(mode="before")(loaded_attributes)
+
+class RequestExpanded(RequestOut):
+    # Связи из ?expand=; незапрошенные в ответе отсутствуют
+    client: Optional[UserBrief] = None
+    master: Optional[UserBrief] = None
+    comments: Optional[List[CommentExpanded]] = None
+    # Только с expand=comments: курсор следующих комментариев или null
+    comments_next_cursor: Optional[str] = None
+
+    _loaded = model_validator(mode="before")(loaded_attributes)
+
+
 # ---------- Auth ----------
 class TokenOut(BaseModel):
     access_token: str
@@ -115,3 +209,12 @@ class AssignSpecialistIn(BaseModel):
 class ExtendDeadlineIn(BaseModel):
     new_completion_date: date
     reason: Optional[str] = None
+
+class QRLabelsIn(BaseModel):
+    # Либо явный список заявок, либо фильтр как у /requests/search
+    request_ids: Optional[List[int]] = Field(None, max_length=1000)
+    status: Optional[str] = None
+    tech_type: Optional[str] = None
+    client_id: Optional[int] = None
+    master_id: Optional[int] = None
+    format: str = Field("pdf", pattern="^(pdf|zip)$")
\ No newline at end of file
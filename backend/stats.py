@@ -0,0 +1,186 @@
+import hashlib
+from sqlalchemy import text, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from . import models
+
+# Агрегаты статистики заявок хранятся в таблице request_stats и
+# обновляются приращениями в той же транзакции, что и сама заявка.
+# Строка = (клиент, измерение, значение); client_id = 0 — по всем заявкам.
+
+ALL_CLIENTS = 0
+DIMENSIONS = {
+    "tech": "climate_tech_type",
+    "problem": "problem_description",
+}
+
+def bucket_key(bucket: str) -> str:
+    """Ключ значения измерения (совпадает с md5() в PostgreSQL)"""
+    return hashlib.md5(bucket.encode("utf-8")).hexdigest()
+
+def snapshot(request):
+    """Поля заявки, от которых зависит статистика"""
+    if request is None:
+        return None
+    return {
+        "client_id": request.client_id,
+        "climate_tech_type": request.climate_tech_type,
+        "problem_description": request.problem_description,
+        "start_date": request.start_date,
+        "completion_date": request.completion_date,
+    }
+
+def _add_deltas(deltas, snap, sign):
+    completed = snap["completion_date"] is not None
+    days = None
+    if completed and snap["start_date"] is not None:
+        days = (snap["completion_date"] - snap["start_date"]).days
+        if days < 0:
+            days = None
+
+    clients = [ALL_CLIENTS]
+    if snap["client_id"] is not None:
+        clients.append(snap["client_id"])
+
+    for client_id in clients:
+        for dimension, field in DIMENSIONS.items():
+            bucket = snap[field]
+            key = (client_id, dimension, bucket_key(bucket))
+            d = deltas.setdefault(key, {"bucket": bucket, "total_count": 0, "completed_count": 0,
+                                        "repair_days_sum": 0, "repair_days_count": 0})
+            d["total_count"] += sign
+            if completed:
+                d["completed_count"] += sign
+            if days is not None:
+                d["repair_days_sum"] += sign * days
+                d["repair_days_count"] += sign
+
+def apply_request_changes(db: Session, changes):
+    """
+    Применить изменения заявок к агрегатам. changes — список пар
+    (старый снимок, новый снимок); None означает отсутствие заявки.
+    Вызывается до commit, в транзакции изменения заявок.
+    """
+    deltas = {}
+    for old, new in changes:
+        if old is not None:
+            _add_deltas(deltas, old, -1)
+        if new is not None:
+            _add_deltas(deltas, new, +1)
+
+    rows = []
+    # Фиксированный порядок ключей исключает взаимоблокировки параллельных транзакций
+    for (client_id, dimension, key), d in sorted(deltas.items()):
+        if not any(d[c] for c in ("total_count", "completed_count", "repair_days_sum", "repair_days_count")):
+            continue
+        rows.append({"client_id": client_id, "dimension": dimension, "bucket_key": key, **d})
+    if not rows:
+        return
+
+    stmt = insert(models.RequestStats).values(rows)
+    table = models.RequestStats
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.client_id, table.dimension, table.bucket_key],
+        set_={
+            "total_count": table.total_count + stmt.excluded.total_count,
+            "completed_count": table.completed_count + stmt.excluded.completed_count,
+            "repair_days_sum": table.repair_days_sum + stmt.excluded.repair_days_sum,
+            "repair_days_count": table.repair_days_count + stmt.excluded.repair_days_count,
+        }
+    )
+    db.execute(stmt)
+
+def apply_request_change(db: Session, old=None, new=None):
+    apply_request_changes(db, [(old, new)])
+
+def remove_client(db: Session, client_id: int):
+    """
+    Удалить агрегаты клиента. При удалении пользователя ORM обнуляет
+    client_id его заявок, поэтому в общих агрегатах они остаются.
+    """
+    db.query(models.RequestStats).filter(
+        models.RequestStats.client_id == client_id
+    ).delete(synchronize_session=False)
+
+REBUILD_SQL = """
+    INSERT INTO climate_service.request_stats
+        (client_id, dimension, bucket_key, bucket,
+         total_count, completed_count, repair_days_sum, repair_days_count)
+    SELECT COALESCE(s.client_id, 0), s.dimension, md5(s.bucket), s.bucket,
+           count(*),
+           count(s.completion_date),
+           COALESCE(sum(s.days) FILTER (WHERE s.days >= 0), 0),
+           count(*) FILTER (WHERE s.days >= 0)
+    FROM (
+        SELECT r.client_id, d.dimension, d.bucket, r.completion_date,
+               r.completion_date - r.start_date AS days
+        FROM climate_service.requests r
+        CROSS JOIN LATERAL (VALUES ('tech', r.climate_tech_type),
+                                   ('problem', r.problem_description)) AS d(dimension, bucket)
+    ) s
+    GROUP BY GROUPING SETS ((s.dimension, s.bucket), (s.client_id, s.dimension, s.bucket))
+    HAVING GROUPING(s.client_id) = 1 OR s.client_id IS NOT NULL
+"""
+
+def rebuild(db: Session):
+    """Полностью пересчитать агрегаты по таблице заявок"""
+    db.execute(text("DELETE FROM climate_service.request_stats"))
+    db.execute(text(REBUILD_SQL))
+
+def get_totals(db: Session, client_id: int = ALL_CLIENTS):
+    """Итоги области: (всего, выполнено, сумма дней ремонта, число заявок с известным сроком)"""
+    table = models.RequestStats
+    row = db.query(
+        func.coalesce(func.sum(table.total_count), 0),
+        func.coalesce(func.sum(table.completed_count), 0),
+        func.coalesce(func.sum(table.repair_days_sum), 0),
+        func.coalesce(func.sum(table.repair_days_count), 0)
+    ).filter(
+        table.client_id == client_id,
+        table.dimension == "tech"
+    ).one()
+    return tuple(int(v) for v in row)
+
+def get_buckets(db: Session, dimension: str, client_id: int = ALL_CLIENTS):
+    """Пары (значение, количество заявок) по измерению"""
+    return db.query(models.RequestStats.bucket, models.RequestStats.total_count).filter(
+        models.RequestStats.client_id == client_id,
+        models.RequestStats.dimension == dimension,
+        models.RequestStats.total_count > 0
+    ).all()
+
+def get_summary(db: Session, client_id: int = ALL_CLIENTS):
+    """Вся статистика области за один запрос к агрегатам"""
+    table = models.RequestStats
+    rows = db.query(
+        table.dimension, table.bucket, table.total_count, table.completed_count,
+        table.repair_days_sum, table.repair_days_count
+    ).filter(
+        table.client_id == client_id,
+        table.total_count > 0
+    ).all()
+
+    total = done = total_days = count = 0
+    by_tech, by_problem = [], []
+    for dimension, bucket, bucket_total, bucket_done, days_sum, days_count in rows:
+        if dimension == "tech":
+            by_tech.append({"tech_type": bucket, "count": bucket_total})
+            # Итоги считаем по одному измерению, чтобы не учесть заявку дважды
+            total += bucket_total
+            done += bucket_done
+            total_days += days_sum
+            count += days_count
+        else:
+            by_problem.append({"problem": bucket, "count": bucket_total})
+
+    avg_days_float = total_days / count if count > 0 else 0
+    return {
+        "count": {"total_requests": total, "completed_requests": done},
+        "avg_time": {
+            "avg_repair_days": round(avg_days_float, 1),
+            "count_completed": count,
+            "total_days": total_days
+        },
+        "by_tech": by_tech,
+        "by_problem": by_problem,
+    }
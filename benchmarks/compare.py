@@ -0,0 +1,52 @@
+"""
+Сравнение двух прогонов benchmarks.suite:
+
+    python -m benchmarks.compare benchmarks/results/A.json benchmarks/results/B.json
+
+Для каждого маршрута печатаются p50/p95/p99, rps и SQL-запросы на вызов
+базового прогона и изменение в процентах.
+"""
+import argparse
+import json
+
+METRICS = [("p50_ms", "p50"), ("p95_ms", "p95"), ("p99_ms", "p99"), ("rps", "rps"),
+           ("queries_per_request", "SQL")]
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def delta(base, new) -> str:
+    if base is None or new is None:
+        return "-"
+    if not base:
+        return "n/a"
+    return f"{(new - base) / base * 100:+.0f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение результатов benchmarks.suite")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    base, new = load(args.base), load(args.new)
+
+    print(f"база:  {base['meta']['commit']}  {base['meta']['started_at']}")
+    print(f"новый: {new['meta']['commit']}  {new['meta']['started_at']}")
+    print(f"{'маршрут':48} " + " ".join(f"{label:>16}" for _, label in METRICS))
+
+    rows = [(name, base["routes"].get(name), new["routes"].get(name))
+            for name in sorted(set(base["routes"]) | set(new["routes"]))]
+    rows.append(("всего", base["total"], new["total"]))
+    for name, b, n in rows:
+        if b is None or n is None:
+            print(f"{name:48} только в {'новом' if b is None else 'базовом'} прогоне")
+            continue
+        cells = []
+        for key, _ in METRICS:
+            value = b.get(key)
+            shown = "-" if value is None else f"{value:.1f}"
+            cells.append(f"{shown:>8} {delta(value, n.get(key)):>7}")
+        print(f"{name:48} " + " ".join(cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Сравнение пропускной способности бэкенда в синхронном (psycopg2, пул потоков)
+и асинхронном (asyncpg, DB_ASYNC=1) режимах работы с БД.
+
+Запуск из корня проекта (нужна заполненная БД climate_service):
+
+    python -m benchmarks.db_modes --login login1 --password pass1 --concurrency 200
+
+Для каждого режима поднимается отдельный uvicorn, затем выбранные маршруты
+опрашиваются заданным числом параллельных клиентов.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/requests/?limit=50",
+    "/requests/search?limit=50",
+    "/requests/stats/summary",
+    "/auth/me",
+]
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+def start_server(port: int, db_async: bool, **extra_env):
+    env = dict(os.environ, DB_ASYNC="1" if db_async else "0", **extra_env)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Сервер {base_url} не запустился за {timeout} с")
+
+async def run_load(base_url: str, token: str, paths, concurrency: int, duration: float):
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker(n):
+            nonlocal errors
+            i = n
+            while time.monotonic() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    r = await client.get(path)
+                    if r.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+async def bench_mode(args, db_async: bool):
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_server(args.port, db_async)
+    try:
+        await wait_ready(base_url)
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            r = await client.post("/auth/login", json={"login": args.login, "password": args.password})
+            r.raise_for_status()
+            token = r.json()["access_token"]
+        # Прогрев пулов соединений
+        await run_load(base_url, token, args.paths, min(args.concurrency, 10), 1)
+        return await run_load(base_url, token, args.paths, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Синхронный и асинхронный доступ к БД под нагрузкой")
+    parser.add_argument("--login", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", dest="paths", action="append",
+                        help="Маршрут для опроса (можно указать несколько раз)")
+    args = parser.parse_args()
+    args.paths = args.paths or DEFAULT_PATHS
+
+    for db_async in (False, True):
+        mode = "async (asyncpg)" if db_async else "sync (psycopg2)"
+        result = asyncio.run(bench_mode(args, db_async))
+        print(f"{mode:18} {result['rps']:8.1f} req/s  "
+              f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  "
+              f"p99 {result['p99_ms']:7.1f} ms  ошибок {result['errors']}")
+
+if __name__ == "__main__":
+    main()
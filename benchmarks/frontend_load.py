@@ -0,0 +1,238 @@
+"""
+Нагрузочный прогон фронтенда (Flask) отдельно от бэкенда: API заменяется
+заглушкой benchmarks.stub_api с заданной задержкой и объёмом ответов, а
+виртуальные пользователи разных ролей открывают страницы в реалистичной
+смеси (главная, списки, карточки заявок, вход).
+
+Фронтенд запускается с UPSTREAM_TIMING_HEADERS=1, поэтому для каждой
+страницы видно, сколько из времени ответа ушло на ожидание API, а сколько —
+на работу самого фронтенда (шаблоны, сессия, логирование):
+
+    python -m benchmarks.frontend_load --concurrency 20 --duration 30 --latency-ms 20 --rows 50
+
+Результат пишется в JSON (по умолчанию benchmarks/results/frontend-<время>-<коммит>.json)
+и сравнивается той же командой python -m benchmarks.compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+from benchmarks.db_modes import percentile, wait_ready
+from benchmarks.suite import RESULTS_DIR, git_revision
+from benchmarks.stub_api import USERS
+
+CREDENTIALS = {role: login for login, (_, role) in USERS.items()}
+
+# Страница (метка в отчёте), роль, вес в смеси, путь; роль None — без входа
+PAGES = [
+    ("GET /", "Менеджер", 4, lambda rng: "/"),
+    ("GET /", "Оператор", 2, lambda rng: "/"),
+    ("GET /requests", "Оператор", 6, lambda rng: "/requests"),
+    ("GET /requests/search", "Оператор", 2,
+     lambda rng: f"/requests/search?status={rng.choice(['Новая заявка', 'В процессе ремонта'])}"),
+    ("GET /requests/<request_id>", "Специалист", 5, lambda rng: f"/requests/{rng.randint(1, 1000)}"),
+    ("GET /comments", "Специалист", 2, lambda rng: "/comments"),
+    ("GET /users", "Менеджер", 1, lambda rng: "/users"),
+    ("GET /statistics", "Менеджер", 2, lambda rng: "/statistics"),
+    ("GET /my-requests", "Заказчик", 3, lambda rng: "/my-requests"),
+    ("GET /my-requests/<request_id>", "Заказчик", 2, lambda rng: f"/my-requests/{rng.randint(1, 1000)}"),
+    ("GET /login", None, 1, lambda rng: "/login"),
+    ("POST /login", None, 1, lambda rng: "/login"),
+]
+
+def start_stub(port: int, args):
+    env = dict(os.environ, STUB_LATENCY_MS=str(args.latency_ms), STUB_JITTER_MS=str(args.jitter_ms),
+               STUB_ROWS=str(args.rows), STUB_COMMENTS=str(args.comments), STUB_TEXT=str(args.text))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_api:app",
+         "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+
+def start_frontend(port: int, api_url: str, args):
+    env = dict(os.environ, API_URL=api_url, UPSTREAM_TIMING_HEADERS="1", LOG_LEVEL=args.log_level,
+               RESPONSE_CACHE_TTL=str(args.response_cache_ttl))
+    # Как python frontend/app.py, но без отладчика и перезагрузчика; логи фронтенда
+    # пишутся (их стоимость входит в замер), но не выводятся
+    return subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "frontend.app", "run",
+         "--port", str(port), "--with-threads", "--no-debugger", "--no-reload"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+async def login(client, role):
+    r = await client.post("/login", data={"login": CREDENTIALS[role], "password": "stub"})
+    if r.status_code != 302:
+        raise RuntimeError(f"Не удалось войти под ролью {role}: {r.status_code}")
+
+async def run_load(base_url: str, concurrency: int, duration: float, seed: int):
+    samples = {name: [] for name, *_ in PAGES}
+    weights = [weight for _, _, weight, _ in PAGES]
+    deadline = time.monotonic() + duration
+
+    async def worker(n):
+        rng = random.Random(seed + n)
+        # У каждого виртуального пользователя свои cookie-сессии для всех ролей,
+        # редиректы не выполняются: замеряется одна страница
+        clients = {}
+
+        async def client_for(role):
+            if role not in clients:
+                clients[role] = httpx.AsyncClient(base_url=base_url, timeout=60)
+                if role is not None:
+                    await login(clients[role], role)
+            return clients[role]
+
+        try:
+            while time.monotonic() < deadline:
+                name, role, _, build = rng.choices(PAGES, weights=weights)[0]
+                client = await client_for(role)
+                started = time.perf_counter()
+                try:
+                    if name == "POST /login":
+                        login_role = rng.choice(list(CREDENTIALS))
+                        r = await client.post("/login", data={"login": CREDENTIALS[login_role], "password": "stub"})
+                        client.cookies.clear()
+                    else:
+                        r = await client.get(build(rng))
+                    status = r.status_code
+                    timing = tuple(r.headers.get(h) for h in ("X-Upstream-Calls", "X-Upstream-Ms", "X-App-Ms"))
+                except httpx.HTTPError:
+                    status, timing = None, (None, None, None)
+                calls, upstream_ms, app_ms = timing
+                samples[name].append((time.perf_counter() - started, status,
+                                      int(calls) if calls else None,
+                                      float(upstream_ms) if upstream_ms else None,
+                                      float(app_ms) if app_ms else None))
+        finally:
+            for client in clients.values():
+                await client.aclose()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+def mean(values):
+    return statistics.fmean(values) if values else None
+
+def summarize(samples, elapsed: float) -> dict:
+    latencies = [s[0] for s in samples]
+    timed = [s for s in samples if s[3] is not None and s[4] is not None]
+    upstream_ms = mean([s[3] for s in timed])
+    app_ms = mean([s[4] for s in timed])
+    statuses = {}
+    for s in samples:
+        key = str(s[1]) if s[1] is not None else "error"
+        statuses[key] = statuses.get(key, 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s[1] is None or s[1] >= 400),
+        "statuses": statuses,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "upstream_calls_per_request": mean([s[2] for s in timed]),
+        # Среднее время внутри фронтенда: ожидание API и всё остальное (шаблоны, сессия, логи)
+        "upstream_ms": upstream_ms,
+        "app_ms": app_ms,
+        "local_ms": app_ms - upstream_ms if timed else None,
+        "upstream_share": upstream_ms / app_ms if timed and app_ms else None,
+        # Вне обработчика: WSGI-сервер, сохранение сессии, сеть
+        "outside_ms": mean([s[0] * 1000 - s[4] for s in timed]),
+    }
+
+async def bench(args):
+    servers = []
+    base_url, api_url = args.url, args.api_url
+    try:
+        if base_url is None:
+            if api_url is None:
+                api_url = f"http://127.0.0.1:{args.stub_port}"
+                servers.append(start_stub(args.stub_port, args))
+                await wait_ready(api_url)
+            base_url = f"http://127.0.0.1:{args.port}"
+            servers.append(start_frontend(args.port, api_url, args))
+        await wait_ready(base_url)
+        # Прогрев: пул соединений с API, кэш шаблонов Jinja
+        await run_load(base_url, min(args.concurrency, 5), args.warmup, args.seed)
+        samples, elapsed = await run_load(base_url, args.concurrency, args.duration, args.seed)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    routes = {name: summarize(s, elapsed) for name, s in samples.items() if s}
+    total = summarize([x for s in samples.values() for x in s], elapsed)
+    return routes, total
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон фронтенда с заглушкой API")
+    parser.add_argument("--url", help="Адрес уже запущенного фронтенда (с UPSTREAM_TIMING_HEADERS=1)")
+    parser.add_argument("--api-url", help="Адрес API для фронтенда (по умолчанию поднимается заглушка)")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--stub-port", type=int, default=8767)
+    parser.add_argument("--latency-ms", type=float, default=20, help="Задержка ответов заглушки")
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--rows", type=int, default=50, help="Строк в списках заглушки")
+    parser.add_argument("--comments", type=int, default=5, help="Комментариев в карточке заявки")
+    parser.add_argument("--text", type=int, default=120, help="Длина описаний и комментариев")
+    parser.add_argument("--log-level", default="DEBUG", help="LOG_LEVEL фронтенда")
+    parser.add_argument("--response-cache-ttl", type=float, default=10,
+                        help="RESPONSE_CACHE_TTL фронтенда (0 — каждый раз ходить в API)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Файл результатов JSON")
+    args = parser.parse_args()
+
+    routes, total = asyncio.run(bench(args))
+
+    def ms(value):
+        return f"{value:.1f}" if value is not None else "-"
+
+    print(f"{'страница':32} {'зап.':>7} {'ош.':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'API':>5} {'ожид.':>8} {'свои':>8} {'доля API':>9} {'вне':>8}")
+    for name, r in sorted(routes.items()) + [("всего", total)]:
+        share = f"{r['upstream_share'] * 100:.0f}%" if r["upstream_share"] is not None else "-"
+        calls = f"{r['upstream_calls_per_request']:.1f}" if r["upstream_calls_per_request"] is not None else "-"
+        print(f"{name:32} {r['requests']:7} {r['errors']:5} {r['rps']:8.1f} "
+              f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} "
+              f"{calls:>5} {ms(r['upstream_ms']):>8} {ms(r['local_ms']):>8} {share:>9} {ms(r['outside_ms']):>8}")
+
+    commit, dirty = git_revision()
+    result = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "total": total,
+        "routes": routes,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"frontend-{stamp}-{commit}{'-dirty' if dirty else ''}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Сравнение сериализации списков заявок: обычный путь (ORM-объекты ->
+response_model через from_attributes -> json) и быстрый (FAST_JSON=1:
+кортежи колонок -> словари -> orjson).
+
+Замер выполняется в процессе, без HTTP, теми же функциями crud, что и
+маршруты /requests/. В БД должно быть не меньше заявок, чем самый большой
+размер страницы (например, после python -m backend.loader --requests big.csv):
+
+    python -m benchmarks.serialization --rows 1000 --rows 10000 --repeat 20
+"""
+import argparse
+import json
+import statistics
+import time
+
+from pydantic import TypeAdapter
+
+from backend import crud, database, fastjson, schemas
+
+# Тот же тип ответа, что у read_requests
+RESPONSE_ADAPTER = TypeAdapter(list[schemas.RequestExpanded])
+
+def orm_path(db, rows: int):
+    """Как FastAPI: проверка response_model, dump в JSON-режиме, json.dumps"""
+    started = time.perf_counter()
+    objects, _ = crud.get_requests(db, limit=rows, expand=frozenset())
+    fetched = time.perf_counter()
+    value = RESPONSE_ADAPTER.validate_python(objects)
+    content = RESPONSE_ADAPTER.dump_python(value, mode="json", exclude_unset=True)
+    built = time.perf_counter()
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+    done = time.perf_counter()
+    return fetched - started, built - fetched, done - built, body
+
+def fast_path(db, rows: int):
+    started = time.perf_counter()
+    tuples, _ = crud.get_requests(db, limit=rows, columns=fastjson.REQUEST_COLUMNS)
+    fetched = time.perf_counter()
+    content = fastjson.rows_to_dicts(tuples, fastjson.REQUEST_FIELDS)
+    built = time.perf_counter()
+    body = fastjson.orjson.dumps(content)
+    done = time.perf_counter()
+    return fetched - started, built - fetched, done - built, body
+
+PATHS = {"orm": orm_path, "fast": fast_path}
+
+def bench(rows: int, repeat: int):
+    result = {}
+    for name, path in PATHS.items():
+        timings = []
+        for _ in range(repeat):
+            # Новая сессия на каждый прогон, как у запроса к API
+            db = database.SessionLocal()
+            try:
+                *phases, body = path(db, rows)
+            finally:
+                db.close()
+            timings.append(phases)
+        query, build, encode = (statistics.median(t[i] for t in timings) for i in range(3))
+        result[name] = {
+            "query_ms": query * 1000,
+            "build_ms": build * 1000,
+            "encode_ms": encode * 1000,
+            "total_ms": (query + build + encode) * 1000,
+            "bytes": len(body),
+            "rows": body.count(b'"request_id"'),
+        }
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Обычная и быстрая сериализация списков заявок")
+    parser.add_argument("--rows", type=int, action="append", help="Размер страницы (можно несколько раз)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", metavar="FILE", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+    sizes = args.rows or [1000, 10000]
+
+    results = {}
+    for rows in sizes:
+        result = bench(rows, args.repeat)
+        results[rows] = result
+        if result["orm"]["rows"] < rows:
+            print(f"Внимание: в БД только {result['orm']['rows']} заявок из {rows}")
+        for name, r in result.items():
+            print(f"{rows:>6} строк  {name:5} запрос {r['query_ms']:8.1f} мс  "
+                  f"объекты {r['build_ms']:8.1f} мс  json {r['encode_ms']:7.1f} мс  "
+                  f"всего {r['total_ms']:8.1f} мс  {r['bytes'] / 1024:8.0f} КБ")
+        speedup = result["orm"]["total_ms"] / result["fast"]["total_ms"] if result["fast"]["total_ms"] else 0
+        print(f"{rows:>6} строк  ускорение x{speedup:.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Заглушка API бэкенда для замеров фронтенда без БД: те же пути и формат
+ответов, что читает frontend/app.py, с заданной задержкой и объёмом данных.
+Ответы собираются один раз при запуске и отдаются готовыми байтами.
+
+Настройка переменными окружения:
+
+    STUB_LATENCY_MS  задержка каждого ответа, мс (20)
+    STUB_JITTER_MS   случайная добавка к задержке, мс (5)
+    STUB_ROWS        строк в списках (50)
+    STUB_COMMENTS    комментариев в карточке заявки (5)
+    STUB_TEXT        длина описаний и комментариев, символов (120)
+
+    API_URL=http://127.0.0.1:8767 ... uvicorn benchmarks.stub_api:app --port 8767
+
+Обычно заглушку поднимает python -m benchmarks.frontend_load.
+"""
+import asyncio
+import json
+import os
+import random
+from datetime import date, timedelta
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+from jose import jwt
+
+LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "20"))
+JITTER_MS = float(os.environ.get("STUB_JITTER_MS", "5"))
+ROWS = int(os.environ.get("STUB_ROWS", "50"))
+COMMENTS = int(os.environ.get("STUB_COMMENTS", "5"))
+TEXT = int(os.environ.get("STUB_TEXT", "120"))
+
+# Учётные записи как в data/users.csv; пароль не проверяется
+USERS = {
+    "login1": (1, "Менеджер"),
+    "login2": (2, "Специалист"),
+    "login4": (4, "Оператор"),
+    "login6": (6, "Заказчик"),
+}
+
+TECH_TYPES = ["Кондиционер", "Увлажнитель воздуха", "Сушилка для рук"]
+STATUSES = ["Новая заявка", "В процессе ремонта", "Готова к выдаче"]
+
+rng = random.Random(0)
+
+def text(prefix: str) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < TEXT:
+        words.append(rng.choice(["не", "работает", "охлаждает", "шумит", "выключается", "запах", "течёт"]))
+    return f"{prefix} {' '.join(words)}"[:TEXT]
+
+def user_brief(user_id: int, user_type: str) -> dict:
+    return {"user_id": user_id, "fio": f"Иванов Иван Иванович {user_id}", "user_type": user_type}
+
+def request_row(request_id: int, expand=()) -> dict:
+    start = date(2023, 1, 1) + timedelta(days=request_id % 365)
+    row = {
+        "request_id": request_id,
+        "start_date": start.isoformat(),
+        "climate_tech_type": TECH_TYPES[request_id % len(TECH_TYPES)],
+        "climate_tech_model": f"Модель {request_id % 17}",
+        "problem_description": text("Проблема:"),
+        "request_status": STATUSES[request_id % len(STATUSES)],
+        "completion_date": (start + timedelta(days=7)).isoformat() if request_id % 3 == 2 else None,
+        "repair_parts": None,
+        "master_id": 2,
+        "client_id": 6,
+    }
+    if "client" in expand:
+        row["client"] = user_brief(6, "Заказчик")
+    if "master" in expand:
+        row["master"] = user_brief(2, "Специалист")
+    if "comments" in expand:
+        row["comments"] = [dict(comment_row(request_id * 100 + i, request_id), master=user_brief(2, "Специалист"))
+                           for i in range(COMMENTS)]
+        row["comments_next_cursor"] = None
+    return row
+
+def comment_row(comment_id: int, request_id: int) -> dict:
+    return {"comment_id": comment_id, "message": text("Комментарий:"), "master_id": 2, "request_id": request_id}
+
+def dump(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+SUMMARY = dump({
+    "count": {"total_requests": 1000, "completed_requests": 400},
+    "avg_time": {"avg_repair_days": 6.5, "count_completed": 400, "total_days": 2600},
+    "by_tech": [{"tech_type": t, "count": 300 + i} for i, t in enumerate(TECH_TYPES)],
+    "by_problem": [{"problem": text(f"Проблема {i}:")[:40], "count": 20 - i} for i in range(15)],
+})
+USERS_PAGE = dump([{"user_id": i, "fio": f"Иванов Иван Иванович {i}", "phone": f"89{i:09d}",
+                    "login": f"login{i}", "user_type": "Заказчик"} for i in range(1, ROWS + 1)])
+COMMENTS_PAGE = dump([comment_row(i, i) for i in range(1, ROWS + 1)])
+REQUESTS_PAGES = {expand: dump([request_row(i, expand) for i in range(1, ROWS + 1)])
+                  for expand in ((), ("client",))}
+
+app = FastAPI(title="Climate Service API (заглушка)")
+
+async def delay():
+    await asyncio.sleep((LATENCY_MS + rng.random() * JITTER_MS) / 1000)
+
+def page(body: bytes, cursor: bool = True) -> Response:
+    # Курсор на следующую страницу, чтобы фронтенд строил ссылку, как с настоящим API
+    headers = {"X-Next-Cursor": "stub"} if cursor else {}
+    return Response(body, media_type="application/json", headers=headers)
+
+def expand_of(request: Request) -> tuple:
+    return tuple(sorted(filter(None, request.query_params.get("expand", "").split(","))))
+
+@app.get("/")
+async def root():
+    return {"stub": True}
+
+@app.post("/auth/login")
+async def login(form: dict):
+    await delay()
+    if form.get("login") not in USERS:
+        raise HTTPException(status_code=400, detail="Пользователь не найден")
+    user_id, role = USERS[form["login"]]
+    token = jwt.encode({"sub": str(user_id), "role": role}, "stub")
+    return {"access_token": token, "token_type": "bearer", "role": role, "user_id": user_id}
+
+@app.get("/auth/me")
+async def me():
+    await delay()
+    return {"user_id": 6, "login": "login6", "fio": "Иванов Иван Иванович 6", "phone": "89000000006",
+            "user_type": "Заказчик"}
+
+@app.get("/requests/stats/summary")
+async def stats_summary():
+    await delay()
+    return Response(SUMMARY, media_type="application/json")
+
+@app.get("/requests/")
+@app.get("/requests/search")
+async def requests_page(request: Request):
+    await delay()
+    expand = ("client",) if "client" in expand_of(request) else ()
+    return page(REQUESTS_PAGES[expand])
+
+@app.get("/requests/{request_id}")
+async def request_detail(request_id: int, request: Request):
+    await delay()
+    return Response(dump(request_row(request_id, expand_of(request))), media_type="application/json")
+
+@app.get("/client/my-requests")
+async def my_requests():
+    await delay()
+    return page(REQUESTS_PAGES[()])
+
+@app.get("/users/")
+async def users_page():
+    await delay()
+    return page(USERS_PAGE)
+
+@app.get("/comments/")
+async def comments_page():
+    await delay()
+    return page(COMMENTS_PAGE)
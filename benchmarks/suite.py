@@ -0,0 +1,285 @@
+"""
+Нагрузочный прогон всех роутеров бэкенда (auth, users, requests, comments,
+client, qr) смесью запросов от имени разных ролей.
+
+Подготовка данных (PostgreSQL из DATABASE_URL):
+
+    python -m benchmarks.synthetic --requests 1000000 --out bench-data --truncate
+
+Прогон: поднимается uvicorn с DB_QUERY_HEADERS=1, каждый маршрут получает
+p50/p95/p99, пропускную способность и среднее число SQL-запросов на вызов.
+Результат пишется в JSON (по умолчанию benchmarks/results/<время>-<коммит>.json),
+прогоны сравниваются командой python -m benchmarks.compare A.json B.json.
+
+    python -m benchmarks.suite --dataset bench-data/dataset.json --concurrency 50 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+
+from benchmarks.db_modes import percentile, start_server, wait_ready
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Без --dataset используются исходные data/*.csv
+SEED_DATASET = {
+    "counts": {"users": 10, "requests": 5, "comments": 3},
+    "credentials": {
+        "Менеджер": {"login": "login1", "password": "pass1", "user_id": 1},
+        "Специалист": {"login": "login2", "password": "pass2", "user_id": 2},
+        "Оператор": {"login": "login4", "password": "pass4", "user_id": 4},
+        "Заказчик": {"login": "login8", "password": "pass8", "user_id": 8},
+    },
+    "tech_types": ["Кондиционер", "Увлажнитель воздуха", "Сушилка для рук"],
+    "statuses": ["В процессе ремонта", "Готова к выдаче", "Новая заявка"],
+    "problem_words": ["охлаждает", "выключается", "запах", "работает"],
+}
+
+class Context:
+    """Данные для построения запросов: объёмы набора и id заявок заказчика"""
+
+    def __init__(self, dataset: dict):
+        self.dataset = dataset
+        self.counts = dataset["counts"]
+        self.client_request_ids = []
+
+    def request_id(self, rng):
+        return rng.randint(1, self.counts["requests"])
+
+    def comment_id(self, rng):
+        return rng.randint(1, max(1, self.counts["comments"]))
+
+    def user_id(self, rng):
+        return rng.randint(1, self.counts["users"])
+
+    def client_request_id(self, rng):
+        return rng.choice(self.client_request_ids) if self.client_request_ids else self.request_id(rng)
+
+# Маршрут (шаблон пути — метка в отчёте), роль, вес в смеси, построитель запроса.
+# Построитель возвращает (метод, путь, json-тело или None).
+READ_SCENARIOS = [
+    ("POST /auth/login", None, 1, lambda rng, ctx: ("POST", "/auth/login", None)),
+    ("GET /auth/me", "Оператор", 2, lambda rng, ctx: ("GET", "/auth/me", None)),
+    ("GET /users/", "Менеджер", 1, lambda rng, ctx: ("GET", "/users/?limit=50", None)),
+    ("GET /users/{user_id}", "Менеджер", 1, lambda rng, ctx: ("GET", f"/users/{ctx.user_id(rng)}", None)),
+    ("GET /requests/", "Оператор", 5, lambda rng, ctx: ("GET", "/requests/?limit=50", None)),
+    ("GET /requests/?sort=start_date", "Оператор", 2,
+     lambda rng, ctx: ("GET", "/requests/?limit=50&sort=start_date", None)),
+    ("GET /requests/search", "Оператор", 4, lambda rng, ctx: (
+        "GET", f"/requests/search?status={rng.choice(ctx.dataset['statuses'])}"
+               f"&tech_type={rng.choice(ctx.dataset['tech_types'])}&limit=50", None)),
+    ("GET /requests/search?q", "Оператор", 2, lambda rng, ctx: (
+        "GET", f"/requests/search?q={rng.choice(ctx.dataset['problem_words'])}&limit=50", None)),
+    ("GET /requests/{request_id}", "Специалист", 5,
+     lambda rng, ctx: ("GET", f"/requests/{ctx.request_id(rng)}", None)),
+    ("GET /requests/{request_id}?expand", "Специалист", 3,
+     lambda rng, ctx: ("GET", f"/requests/{ctx.request_id(rng)}?expand=client,master,comments", None)),
+    ("GET /requests/{request_id}/comments", "Специалист", 2,
+     lambda rng, ctx: ("GET", f"/requests/{ctx.request_id(rng)}/comments", None)),
+    ("GET /requests/stats/summary", "Менеджер", 2, lambda rng, ctx: ("GET", "/requests/stats/summary", None)),
+    ("GET /requests/stats/count", "Менеджер", 1, lambda rng, ctx: ("GET", "/requests/stats/count", None)),
+    ("GET /requests/stats/avg-time", "Менеджер", 1, lambda rng, ctx: ("GET", "/requests/stats/avg-time", None)),
+    ("GET /requests/stats/by-tech", "Менеджер", 1, lambda rng, ctx: ("GET", "/requests/stats/by-tech", None)),
+    ("GET /requests/stats/by-problem-type", "Менеджер", 1,
+     lambda rng, ctx: ("GET", "/requests/stats/by-problem-type", None)),
+    ("GET /requests/debug/statuses", "Менеджер", 1, lambda rng, ctx: ("GET", "/requests/debug/statuses", None)),
+    ("GET /comments/", "Специалист", 2, lambda rng, ctx: ("GET", "/comments/?limit=50", None)),
+    ("GET /comments/{comment_id}", "Специалист", 1,
+     lambda rng, ctx: ("GET", f"/comments/{ctx.comment_id(rng)}", None)),
+    ("GET /client/my-requests", "Заказчик", 4, lambda rng, ctx: ("GET", "/client/my-requests?limit=50", None)),
+    ("GET /client/my-requests/{request_id}", "Заказчик", 2,
+     lambda rng, ctx: ("GET", f"/client/my-requests/{ctx.client_request_id(rng)}", None)),
+    ("GET /client/my-requests/{request_id}/comments", "Заказчик", 1,
+     lambda rng, ctx: ("GET", f"/client/my-requests/{ctx.client_request_id(rng)}/comments", None)),
+    ("GET /qr/feedback", "Заказчик", 1, lambda rng, ctx: ("GET", "/qr/feedback", None)),
+]
+
+def _new_comment(rng, ctx):
+    master = ctx.dataset["credentials"]["Специалист"]["user_id"]
+    return "POST", "/comments/", {"message": "Нагрузочный тест", "master_id": master,
+                                  "request_id": ctx.request_id(rng)}
+
+def _update_request(rng, ctx):
+    return "PUT", f"/requests/{ctx.request_id(rng)}", {"request_status": rng.choice(ctx.dataset["statuses"])}
+
+def _new_client_request(rng, ctx):
+    # Тело как у фронтенда (new_my_request)
+    day = date.today() - timedelta(days=rng.randrange(30))
+    return "POST", "/client/my-requests", {
+        "start_date": day.isoformat(),
+        "climate_tech_type": rng.choice(ctx.dataset["tech_types"]),
+        "climate_tech_model": "Нагрузочный тест",
+        "problem_description": rng.choice(ctx.dataset["problem_words"]),
+        "request_status": "Новая заявка",
+        "client_id": ctx.dataset["credentials"]["Заказчик"]["user_id"],
+    }
+
+# Изменяющие запросы включаются флагом --writes
+WRITE_SCENARIOS = [
+    ("POST /comments/", "Специалист", 1, _new_comment),
+    ("PUT /requests/{request_id}", "Менеджер", 1, _update_request),
+    ("POST /client/my-requests", "Заказчик", 1, _new_client_request),
+]
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+async def login(client, credentials):
+    r = await client.post("/auth/login", json={"login": credentials["login"], "password": credentials["password"]})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+async def prepare(client, ctx):
+    """Токены всех ролей и id заявок заказчика"""
+    headers = {role: await login(client, cred) for role, cred in ctx.dataset["credentials"].items()}
+    r = await client.get("/client/my-requests?limit=500", headers=headers["Заказчик"])
+    if r.status_code == 200:
+        ctx.client_request_ids = [row["request_id"] for row in r.json()]
+    return headers
+
+async def run_load(client, ctx, headers, scenarios, concurrency: int, duration: float, seed: int):
+    samples = {name: [] for name, *_ in scenarios}
+    weights = [weight for _, _, weight, _ in scenarios]
+    deadline = time.monotonic() + duration
+
+    async def worker(n):
+        rng = random.Random(seed + n)
+        while time.monotonic() < deadline:
+            name, role, _, build = rng.choices(scenarios, weights=weights)[0]
+            method, path, body = build(rng, ctx)
+            if name == "POST /auth/login":
+                cred = ctx.dataset["credentials"][rng.choice(list(ctx.dataset["credentials"]))]
+                body = {"login": cred["login"], "password": cred["password"]}
+            started = time.perf_counter()
+            try:
+                r = await client.request(method, path, json=body, headers=headers.get(role))
+                # Тело читается целиком: в замер входит вся отдача ответа
+                status = r.status_code
+                queries = r.headers.get("X-DB-Queries")
+                db_ms = r.headers.get("X-DB-Time-Ms")
+            except httpx.HTTPError:
+                status, queries, db_ms = None, None, None
+            samples[name].append((time.perf_counter() - started, status,
+                                  int(queries) if queries else None, float(db_ms) if db_ms else None))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+def summarize(samples, elapsed: float) -> dict:
+    latencies = [s[0] for s in samples]
+    queries = [s[2] for s in samples if s[2] is not None]
+    db_ms = [s[3] for s in samples if s[3] is not None]
+    statuses = {}
+    for s in samples:
+        key = str(s[1]) if s[1] is not None else "error"
+        statuses[key] = statuses.get(key, 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s[1] is None or s[1] >= 400),
+        "statuses": statuses,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "queries_per_request": statistics.fmean(queries) if queries else None,
+        "db_ms_per_request": statistics.fmean(db_ms) if db_ms else None,
+    }
+
+async def bench(args, dataset):
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, args.db_async, DB_QUERY_HEADERS="1")
+    try:
+        await wait_ready(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            ctx = Context(dataset)
+            headers = await prepare(client, ctx)
+            scenarios = READ_SCENARIOS + (WRITE_SCENARIOS if args.writes else [])
+            # Прогрев пулов соединений и кэшей
+            await run_load(client, ctx, headers, scenarios, min(args.concurrency, 10), args.warmup, args.seed)
+            samples, elapsed = await run_load(client, ctx, headers, scenarios,
+                                              args.concurrency, args.duration, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    routes = {name: summarize(s, elapsed) for name, s in samples.items() if s}
+    total = summarize([x for s in samples.values() for x in s], elapsed)
+    return routes, total
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон всех роутеров бэкенда")
+    parser.add_argument("--dataset", help="dataset.json из benchmarks.synthetic (по умолчанию data/*.csv)")
+    parser.add_argument("--url", help="Адрес уже запущенного бэкенда (иначе поднимается uvicorn)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--db-async", action="store_true", help="Запустить бэкенд с DB_ASYNC=1")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--writes", action="store_true", help="Добавить изменяющие запросы в смесь")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Файл результатов JSON")
+    args = parser.parse_args()
+
+    dataset = SEED_DATASET
+    if args.dataset:
+        with open(args.dataset, encoding="utf-8") as f:
+            dataset = json.load(f)
+
+    routes, total = asyncio.run(bench(args, dataset))
+
+    print(f"{'маршрут':48} {'зап.':>7} {'ош.':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>5}")
+    for name, r in sorted(routes.items()):
+        q = f"{r['queries_per_request']:.1f}" if r["queries_per_request"] is not None else "-"
+        print(f"{name:48} {r['requests']:7} {r['errors']:5} {r['rps']:8.1f} "
+              f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {q:>5}")
+    print(f"{'всего':48} {total['requests']:7} {total['errors']:5} {total['rps']:8.1f} "
+          f"{total['p50_ms']:8.1f} {total['p95_ms']:8.1f} {total['p99_ms']:8.1f}")
+
+    commit, dirty = git_revision()
+    result = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k != "output"},
+            "dataset": {k: dataset.get(k) for k in ("counts", "roles", "seed")},
+        },
+        "total": total,
+        "routes": routes,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{commit}{'-dirty' if dirty else ''}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Синтетические пользователи, заявки и комментарии в масштабе, с
+распределениями из data/*.csv: доли ролей, типы и модели оборудования,
+описания проблем, статусы (дата завершения и специалист — как у исходных
+заявок с тем же статусом), интервал дат, число и тексты комментариев.
+
+Файлы пишутся в формате data/*.csv и загружаются backend.loader (COPY):
+
+    python -m benchmarks.synthetic --requests 1000000 --truncate
+
+Рядом с файлами сохраняется dataset.json: объёмы, seed и учётные данные
+пользователей каждой роли — его читает benchmarks.suite.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import text
+
+from backend import loader, models
+from backend.database import engine
+
+ROLES = ("Менеджер", "Специалист", "Оператор", "Заказчик")
+
+def read_seed(name: str):
+    model, mapping = loader.SOURCES[name]
+    return list(loader.read_rows(loader.DEFAULT_FILES[name], model, mapping))
+
+class Distributions:
+    """Эмпирические распределения исходных данных"""
+
+    def __init__(self):
+        users = read_seed("users")
+        requests = read_seed("requests")
+        comments = read_seed("comments")
+
+        self.roles = Counter(u["user_type"] for u in users)
+        # ФИО собираются из частей исходных, чтобы не повторяться дословно
+        parts = [u["fio"].split() for u in users]
+        self.last_names = [p[0] for p in parts]
+        self.first_names = [p[1] for p in parts]
+        self.patronymics = [p[2] for p in parts if len(p) > 2]
+
+        self.tech_types = Counter(r["climate_tech_type"] for r in requests)
+        self.models = {}
+        self.problems = {}
+        for r in requests:
+            self.models.setdefault(r["climate_tech_type"], []).append(r["climate_tech_model"])
+            self.problems.setdefault(r["climate_tech_type"], []).append(r["problem_description"])
+        self.statuses = Counter(r["request_status"] for r in requests)
+        self.status_assigned = {s: sum(1 for r in requests if r["request_status"] == s and r["master_id"])
+                                / n for s, n in self.statuses.items()}
+        self.status_completed = {s: sum(1 for r in requests if r["request_status"] == s and r["completion_date"])
+                                 / n for s, n in self.statuses.items()}
+        durations = [(r["completion_date"] - r["start_date"]).days for r in requests
+                     if r["completion_date"] and r["completion_date"] >= r["start_date"]]
+        self.mean_repair_days = sum(durations) / len(durations) if durations else 14
+        starts = [r["start_date"] for r in requests]
+        self.first_date, self.last_date = min(starts), max(starts)
+
+        self.comments_per_request = len(comments) / len(requests)
+        self.messages = [c["message"] for c in comments]
+
+def weighted(rng: random.Random, counter: Counter):
+    keys = list(counter)
+    return rng.choices(keys, weights=[counter[k] for k in keys])[0]
+
+# Штат растёт медленнее клиентской базы: сотрудников в исходной пропорции
+# к заказчикам, умноженной на этот коэффициент
+STAFF_SCALE = 0.01
+
+def user_counts(dist: Distributions, requests: int, clients: int = None) -> dict:
+    """Число пользователей каждой роли; заказчиков по умолчанию в пять раз меньше заявок"""
+    clients = clients or max(1, requests // 5)
+    per_client = clients / dist.roles["Заказчик"]
+    return {role: clients if role == "Заказчик" else max(1, round(dist.roles[role] * per_client * STAFF_SCALE))
+            for role in ROLES}
+
+def generate(out_dir: str, requests: int, clients: int = None, seed: int = 42) -> dict:
+    """Записать users/requests/comments CSV, вернуть описание набора"""
+    rng = random.Random(seed)
+    dist = Distributions()
+    counts = user_counts(dist, requests, clients)
+    os.makedirs(out_dir, exist_ok=True)
+    files = {name: os.path.join(out_dir, f"{name}.csv") for name in loader.SOURCES}
+
+    def writer(f, name):
+        w = csv.writer(f, delimiter=";", lineterminator="\n")
+        w.writerow(loader.SOURCES[name][1].keys())
+        return w
+
+    def value(v):
+        return loader.NULL_TOKEN if v is None else v
+
+    # Пользователи: сначала сотрудники, затем заказчики; id сплошные
+    ids = {}
+    with open(files["users"], "w", encoding="utf-8", newline="") as f:
+        w = writer(f, "users")
+        user_id = 0
+        for role in ROLES:
+            ids[role] = range(user_id + 1, user_id + counts[role] + 1)
+            for user_id in ids[role]:
+                fio = (f"{rng.choice(dist.last_names)} {rng.choice(dist.first_names)} "
+                       f"{rng.choice(dist.patronymics)}")
+                w.writerow([user_id, fio, f"89{rng.randrange(10**9):09d}",
+                            f"login{user_id}", f"pass{user_id}", role])
+
+    span = (dist.last_date - dist.first_date).days or 365
+    masters = ids["Специалист"]
+    client_requests = {}
+    comment_id = 0
+    with open(files["requests"], "w", encoding="utf-8", newline="") as fr, \
+         open(files["comments"], "w", encoding="utf-8", newline="") as fc:
+        wr, wc = writer(fr, "requests"), writer(fc, "comments")
+        for request_id in range(1, requests + 1):
+            tech = weighted(rng, dist.tech_types)
+            status = weighted(rng, dist.statuses)
+            start = dist.first_date + timedelta(days=rng.randrange(span + 1))
+            completion = None
+            if rng.random() < dist.status_completed[status]:
+                completion = start + timedelta(days=1 + int(rng.expovariate(1 / dist.mean_repair_days)))
+            master = rng.choice(masters) if rng.random() < dist.status_assigned[status] else None
+            # Заказчики с разным числом заявок: квадрат равномерной величины смещает к началу
+            client = ids["Заказчик"][int(rng.random() ** 2 * len(ids["Заказчик"]))]
+            client_requests.setdefault(client, 0)
+            client_requests[client] += 1
+            wr.writerow([request_id, start.isoformat(), tech, rng.choice(dist.models[tech]),
+                         rng.choice(dist.problems[tech]), status, value(completion and completion.isoformat()),
+                         "", value(master), client])
+
+            n_comments = int(dist.comments_per_request) + (rng.random() < dist.comments_per_request % 1)
+            for _ in range(n_comments):
+                comment_id += 1
+                wc.writerow([comment_id, rng.choice(dist.messages), master or rng.choice(masters), request_id])
+
+    busiest = max(client_requests, key=client_requests.get) if client_requests else None
+    dataset = {
+        "seed": seed,
+        "files": files,
+        "counts": {"users": sum(counts.values()), "requests": requests, "comments": comment_id},
+        "roles": counts,
+        # Учётные данные для нагрузочного прогона: первый пользователь каждой роли,
+        # для заказчика — самый нагруженный
+        "credentials": {
+            role: {"login": f"login{uid}", "password": f"pass{uid}", "user_id": uid}
+            for role, uid in ((r, ids[r][0]) for r in ROLES[:3])
+        },
+        "tech_types": list(dist.tech_types),
+        "statuses": list(dist.statuses),
+        # Слова для полнотекстового поиска
+        "problem_words": sorted({word for problems in dist.problems.values() for problem in problems
+                                 for word in problem.lower().split() if len(word) > 4}),
+    }
+    if busiest is not None:
+        dataset["credentials"]["Заказчик"] = {"login": f"login{busiest}", "password": f"pass{busiest}",
+                                              "user_id": busiest}
+    with open(os.path.join(out_dir, "dataset.json"), "w", encoding="utf-8") as f:
+        json.dump(dataset, f, ensure_ascii=False, indent=2)
+    return dataset
+
+def truncate(bind=engine):
+    """Очистить таблицы climate_service перед загрузкой набора"""
+    tables = ", ".join(f"{m.__table__.schema}.{m.__table__.name}"
+                       for m in (models.Comment, models.Request, models.User, models.RequestStats))
+    with bind.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетические данные по распределениям data/*.csv")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--clients", type=int, help="Число заказчиков (по умолчанию заявок / 5)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Каталог для CSV и dataset.json (по умолчанию временный)")
+    parser.add_argument("--truncate", action="store_true", help="Очистить таблицы перед загрузкой")
+    parser.add_argument("--no-load", action="store_true", help="Только сгенерировать файлы")
+    args = parser.parse_args()
+
+    out_dir = args.out or tempfile.mkdtemp(prefix="climate-bench-")
+    dataset = generate(out_dir, args.requests, args.clients, args.seed)
+    print(f"Сгенерировано в {out_dir}: " + ", ".join(f"{k} {v}" for k, v in dataset["counts"].items()))
+    if args.no_load:
+        return
+    if args.truncate:
+        truncate()
+    loader.load(dataset["files"])
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,116 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
-import requests as http
+from flask import Flask, Response, jsonify, render_template, request, redirect, url_for, flash, session, send_file, has_request_context
+from collections import OrderedDict
+import httpx
 import io
+import os
+import threading
+import time
 from functools import wraps
 import logging
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
 from datetime import datetime
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey123!@#"
 app.config['BOOTSTRAP_SERVE_LOCAL'] = True
 
-API_URL = "http://127.0.0.1:8000"
+API_URL = os.environ.get("API_URL", "http://127.0.0.1:8000")
 
-logging.basicConfig(level=logging.DEBUG)
+# Настройки пула соединений с бэкендом
+API_POOL_SIZE = int(os.environ.get("API_POOL_SIZE", "20"))
+API_CONNECT_TIMEOUT = float(os.environ.get("API_CONNECT_TIMEOUT", "3"))
+API_READ_TIMEOUT = float(os.environ.get("API_READ_TIMEOUT", "15"))
+API_GET_RETRIES = int(os.environ.get("API_GET_RETRIES", "2"))
+# Ответы шлюза, при которых идемпотентный GET можно повторить
+RETRY_STATUSES = {502, 503, 504}
+# Число GET-ответов с ETag, которые хранятся для перепроверки через If-None-Match
+API_VALIDATOR_CACHE_SIZE = int(os.environ.get("API_VALIDATOR_CACHE_SIZE", "512"))
+# Кэш ответов для страниц-списков и статистики: время жизни (0 — выключен) и размер
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "10"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "1000"))
+# Отдавать время ожидания бэкенда и обработки страницы заголовками
+# X-Upstream-Calls / X-Upstream-Ms / X-App-Ms (для benchmarks.frontend_load)
+UPSTREAM_TIMING_HEADERS = os.environ.get("UPSTREAM_TIMING_HEADERS", "0") == "1"
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG"))
 logger = logging.getLogger(__name__)
 
+# Метрики страниц для Prometheus (GET /metrics). Метка route — правило Flask
+# (/requests/<int:request_id>); при нескольких процессах нужен PROMETHEUS_MULTIPROC_DIR
+UNMATCHED_ROUTE = "<unmatched>"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PAGE_REQUESTS = Counter("http_requests_total", "HTTP-запросы по маршрутам и кодам ответа",
+                        ["method", "route", "status"])
+PAGE_LATENCY = Histogram("http_request_duration_seconds", "Время обработки страницы",
+                         ["method", "route"], buckets=LATENCY_BUCKETS)
+PAGES_IN_PROGRESS = Gauge("http_requests_in_progress", "Запросы в обработке", ["method", "route"],
+                          multiprocess_mode="livesum")
+UPSTREAM_CALLS = Histogram("http_request_upstream_calls", "Запросов к API на страницу",
+                           ["method", "route"], buckets=(0, 1, 2, 3, 5, 10))
+UPSTREAM_TIME = Histogram("http_request_upstream_duration_seconds", "Ожидание API на страницу",
+                          ["method", "route"], buckets=LATENCY_BUCKETS)
+
+_http_client = None
+_http_client_pid = None
+_http_client_lock = threading.Lock()
+
+def get_http_client():
+    """
+    Общий для процесса HTTP-клиент с пулом keep-alive соединений.
+    httpx.Client потокобезопасен; после fork создаётся заново.
+    """
+    global _http_client, _http_client_pid
+    pid = os.getpid()
+    if _http_client is None or _http_client_pid != pid:
+        with _http_client_lock:
+            if _http_client is None or _http_client_pid != pid:
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=API_POOL_SIZE,
+                        max_keepalive_connections=API_POOL_SIZE
+                    ),
+                    timeout=httpx.Timeout(
+                        API_READ_TIMEOUT,
+                        connect=API_CONNECT_TIMEOUT,
+                        pool=API_CONNECT_TIMEOUT
+                    )
+                )
+                _http_client_pid = pid
+    return _http_client
+
+def record_upstream(elapsed):
+    """Учесть ожидание бэкенда в текущем запросе к фронтенду"""
+    if has_request_context():
+        timing = request.environ.setdefault("frontend.upstream", {"calls": 0, "seconds": 0.0})
+        timing["calls"] += 1
+        timing["seconds"] += elapsed
+
+def send_api_request(method, url, **kwargs):
+    """Отправить запрос через общий клиент; GET повторяется ограниченное число раз"""
+    started = time.perf_counter()
+    try:
+        return _send_with_retries(method, url, **kwargs)
+    finally:
+        record_upstream(time.perf_counter() - started)
+
+def _send_with_retries(method, url, **kwargs):
+    client = get_http_client()
+    attempts = 1 + (API_GET_RETRIES if method == 'GET' else 0)
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        try:
+            response = client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if last_attempt:
+                raise
+            logger.warning(f"Retrying {method} {url} after error: {e}")
+        else:
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                return response
+            logger.warning(f"Retrying {method} {url} after status {response.status_code}")
+        time.sleep(0.1 * 2 ** attempt)
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -41,6 +138,147 @@ def api_headers():
     token = session.get("token")
     return {"Authorization": f"Bearer {token}"} if token else {}
 
+def next_page_url(response, endpoint, **params):
+    """Ссылка на следующую страницу по курсору из заголовка X-Next-Cursor"""
+    next_cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+    if not next_cursor:
+        return None
+    params["cursor"] = next_cursor
+    return url_for(endpoint, **params)
+
+class ValidatorCache:
+    """
+    Последние GET-ответы бэкенда с ETag. Повторный запрос идёт с If-None-Match,
+    и при 304 используется сохранённый ответ — тело заново не передаётся.
+    Ключ включает токен, чтобы ответы разных пользователей не смешивались.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.revalidated = 0
+
+    @staticmethod
+    def key(url, params, headers):
+        items = sorted((params or {}).items())
+        return (url, tuple((k, str(v)) for k, v in items), headers.get("Authorization"))
+
+    def get(self, key):
+        with self._lock:
+            response = self._items.get(key)
+            if response is not None:
+                self._items.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = response
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def hit(self):
+        with self._lock:
+            self.revalidated += 1
+
+validator_cache = ValidatorCache(API_VALIDATOR_CACHE_SIZE)
+
+class ResponseCache:
+    """
+    Ответы API с коротким временем жизни. Сотрудники одной роли видят одни и те же
+    данные и делят записи, у заказчиков записи свои. Записи помечены первым
+    сегментом пути (requests, users, comments, client) — по нему их сбрасывают
+    изменяющие маршруты этого процесса; в остальных процессах их ограничивает TTL.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def tag(endpoint: str) -> str:
+        return endpoint.strip("/").split("/")[0]
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, response):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, response)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, *tags):
+        """Сбросить записи с указанными метками во всех областях"""
+        with self._lock:
+            stale = [key for key in self._items if key[1] in tags]
+            for key in stale:
+                del self._items[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+response_cache = ResponseCache(RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE)
+# Какие записи кэша устаревают после изменения через API (по первому сегменту пути).
+# Пользователи видны в заявках через ФИО, комментарии — на странице заявки.
+CACHE_INVALIDATES = {
+    "users": ("users", "requests", "client", "comments"),
+    "requests": ("requests", "client", "comments"),
+    "client": ("requests", "client"),
+    "comments": ("comments", "client"),
+}
+
+def cache_scope():
+    """Область кэша: роль для сотрудников, токен для заказчика"""
+    role = session.get("role")
+    if role == "Заказчик":
+        return ("user", session.get("token"))
+    return ("role", role)
+
+def cached_api_request(endpoint, params=None):
+    """GET к API через кэш ответов; ошибки не кэшируются"""
+    key = (cache_scope(), ResponseCache.tag(endpoint), endpoint,
+           tuple(sorted((k, str(v)) for k, v in (params or {}).items())))
+    response = response_cache.get(key)
+    if response is not None:
+        return response, None
+
+    response, error = make_api_request('GET', endpoint, params=params, headers=api_headers())
+    if error is None and response:
+        response_cache.put(key, response)
+    return response, error
+
 def make_api_request(method, endpoint, **kwargs):
     try:
         url = f"{API_URL}{endpoint}"
@@ -53,19 +291,29 @@ def make_api_request(method, endpoint, **kwargs):
         
         logger.debug(f"Making {method} request to {url}")
         
-        if method == 'GET':
-            response = http.get(url, **kwargs)
-        elif method == 'POST':
-            response = http.post(url, **kwargs)
-        elif method == 'PUT':
-            response = http.put(url, **kwargs)
-        elif method == 'DELETE':
-            response = http.delete(url, **kwargs)
-        else:
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
             return None, "Неверный метод запроса"
         
+        cache_key = cached = None
+        if method == 'GET':
+            cache_key = ValidatorCache.key(url, kwargs.get('params'), headers)
+            cached = validator_cache.get(cache_key)
+            if cached is not None:
+                kwargs['headers'] = {**headers, "If-None-Match": cached.headers["ETag"]}
+        
+        response = send_api_request(method, url, **kwargs)
+        
+        if cache_key is not None:
+            if response.status_code == 304 and cached is not None:
+                validator_cache.hit()
+                response = cached
+            elif response.status_code == 200 and "ETag" in response.headers:
+                validator_cache.put(cache_key, response)
+        
         logger.debug(f"API Response: {response.status_code}")
         if response.status_code in [200, 201]:
+            if method != 'GET':
+                response_cache.invalidate(*CACHE_INVALIDATES.get(ResponseCache.tag(endpoint), ()))
             return response, None
         else:
             try:
@@ -83,96 +331,51 @@ def make_api_request(method, endpoint, **kwargs):
         logger.error(f"API request error: {e}")
         return None, f"Ошибка подключения к серверу: {str(e)}"
 
+def route_label():
+    return request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+
+@app.before_request
+def start_timing():
+    request.environ["frontend.started"] = time.perf_counter()
+    PAGES_IN_PROGRESS.labels(request.method, route_label()).inc()
+
+@app.teardown_request
+def finish_timing(exc):
+    PAGES_IN_PROGRESS.labels(request.method, route_label()).dec()
+
+@app.after_request
+def timing_headers(response):
+    """Метрики страницы; время ожидания бэкенда и полное время обработки — в заголовках"""
+    timing = request.environ.get("frontend.upstream", {"calls": 0, "seconds": 0.0})
+    elapsed = time.perf_counter() - request.environ.get("frontend.started", time.perf_counter())
+    method, route = request.method, route_label()
+    PAGE_REQUESTS.labels(method, route, str(response.status_code)).inc()
+    PAGE_LATENCY.labels(method, route).observe(elapsed)
+    UPSTREAM_CALLS.labels(method, route).observe(timing["calls"])
+    UPSTREAM_TIME.labels(method, route).observe(timing["seconds"])
+    if UPSTREAM_TIMING_HEADERS:
+        response.headers["X-Upstream-Calls"] = str(timing["calls"])
+        response.headers["X-Upstream-Ms"] = f"{timing['seconds'] * 1000:.2f}"
+        response.headers["X-App-Ms"] = f"{elapsed * 1000:.2f}"
+    return response
+
 @app.route("/")
 def index():
     """Главная страница"""
     stats = None
     if session.get("token"):
-        try:
-            if session.get("role") == "Заказчик":
-                # Для заказчиков - получаем список заявок и считаем вручную
-                response, error = make_api_request('GET', '/client/my-requests', headers=api_headers())
-                if error is None and response:
-                    requests = response.json()
-                    total = len(requests)
-                    completed = sum(1 for r in requests if r.get('completion_date') is not None)
-                    
-                    # Подсчет по типам оборудования
-                    tech_counts = {}
-                    for r in requests:
-                        tech_type = r.get('climate_tech_type', 'Неизвестно')
-                        tech_counts[tech_type] = tech_counts.get(tech_type, 0) + 1
-                    
-                    by_tech = [{"tech_type": k, "count": v} for k, v in tech_counts.items()]
-                    
-                    count_stats = {
-                        "total_requests": total,
-                        "completed_requests": completed
-                    }
-                    
-                    # Простое среднее время (если есть завершенные заявки)
-                    completed_requests = [r for r in requests if r.get('completion_date')]
-                    if completed_requests:
-                        total_days = 0
-                        count = 0
-                        for r in completed_requests:
-                            if r.get('start_date') and r.get('completion_date'):
-                                try:
-                                    start = datetime.strptime(r['start_date'], '%Y-%m-%d')
-                                    end = datetime.strptime(r['completion_date'], '%Y-%m-%d')
-                                    days = (end - start).days
-                                    total_days += days
-                                    count += 1
-                                except:
-                                    pass
-                        avg_days = total_days / count if count > 0 else 0
-                    else:
-                        avg_days = 0
-                    
-                    avg_time = {"avg_repair_days": round(avg_days, 1)}
-                    by_problem = []
-                    
-                else:
-                    count_stats = {"total_requests": 0, "completed_requests": 0}
-                    avg_time = {"avg_repair_days": 0}
-                    by_tech = []
-                    by_problem = []
-            
-            else:
-                # Для сотрудников - стандартные эндпоинты
-                response, error = make_api_request('GET', '/requests/stats/count', headers=api_headers())
-                if error is None and response:
-                    count_stats = response.json()
-                else:
-                    count_stats = {"total_requests": 0, "completed_requests": 0}
-                
-                response, error = make_api_request('GET', '/requests/stats/avg-time', headers=api_headers())
-                if error is None and response:
-                    avg_time = response.json()
-                else:
-                    avg_time = {"avg_repair_days": 0}
-                
-                response, error = make_api_request('GET', '/requests/stats/by-tech', headers=api_headers())
-                if error is None and response:
-                    by_tech = response.json()
-                else:
-                    by_tech = []
-                
-                response, error = make_api_request('GET', '/requests/stats/by-problem-type', headers=api_headers())
-                if error is None and response:
-                    by_problem = response.json()
-                else:
-                    by_problem = []
-            
+        # Вся статистика (для заказчика — по его заявкам) одним запросом
+        response, error = cached_api_request('/requests/stats/summary')
+        if error is None and response:
+            summary = response.json()
             stats = {
-                'count': count_stats,
-                'avg': avg_time,
-                'by_tech': by_tech,
-                'by_problem': by_problem
+                'count': summary.get('count'),
+                'avg': summary.get('avg_time'),
+                'by_tech': summary.get('by_tech', []),
+                'by_problem': summary.get('by_problem', [])
             }
-            
-        except Exception as e:
-            logger.error(f"Error loading stats: {e}")
+        else:
+            logger.error(f"Error loading stats: {error}")
             stats = {
                 'count': {"total_requests": 0, "completed_requests": 0},
                 'avg': {"avg_repair_days": 0},
@@ -231,16 +434,20 @@ def logout():
 @login_required
 @role_required("Менеджер", "Менеджер по качеству")
 def users_list():
-    response, error = make_api_request('GET', '/users/', headers=api_headers())
+    params = {k: v for k, v in request.args.items() if v}
+    response, error = cached_api_request('/users/', params=params)
     
+    next_url = None
     if error is None and response:
         users = response.json()
+        next_url = next_page_url(response, "users_list")
     else:
         users = []
         flash(error or "Ошибка загрузки пользователей", "danger")
     
     return render_template("users/list.html", 
                          users=users, 
+                         next_url=next_url,
                          role=session.get("role"),
                          title="Управление пользователями")
 
@@ -290,10 +497,14 @@ def delete_user(user_id):
 @login_required
 @role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
 def requests_list():
-    response, error = make_api_request('GET', '/requests/', headers=api_headers())
+    params = {k: v for k, v in request.args.items() if v}
+    response, error = cached_api_request('/requests/', params={**params, 'expand': 'client'})
     
+    next_url = None
     if error is None and response:
         requests_data = response.json()
+        sort = params.get("sort")
+        next_url = next_page_url(response, "requests_list", **({"sort": sort} if sort else {}))
     else:
         requests_data = []
         if error:
@@ -301,6 +512,7 @@ def requests_list():
     
     return render_template("requests/list.html", 
                          requests=requests_data, 
+                         next_url=next_url,
                          role=session.get("role"),
                          title="Список заявок")
 
@@ -309,10 +521,15 @@ def requests_list():
 @role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
 def search_requests():
     params = {k: v for k, v in request.args.items() if v}
-    response, error = make_api_request('GET', '/requests/search', params=params, headers=api_headers())
+    response, error = make_api_request('GET', '/requests/search', params={**params, 'expand': 'client'},
+                                       headers=api_headers())
     
+    # Параметры фильтра без курсора — для ссылок "следующая страница" / "в начало"
+    search_params = {k: v for k, v in params.items() if k != "cursor"}
+    next_url = None
     if error is None and response:
         requests_data = response.json()
+        next_url = next_page_url(response, "search_requests", **search_params)
         if not requests_data:
             flash("Поиск не дал результатов", "info")
     else:
@@ -322,10 +539,72 @@ def search_requests():
     
     return render_template("requests/list.html", 
                          requests=requests_data, 
+                         next_url=next_url,
                          role=session.get("role"),
-                         search_params=params,
+                         search_params=search_params,
                          title="Результаты поиска")
 
+@app.route("/requests/labels")
+@login_required
+@role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
+def request_labels():
+    """QR-метки для печати по заявкам текущей страницы"""
+    ids = [int(i) for i in request.args.get("ids", "").split(",") if i.strip().isdigit()]
+    fmt = "zip" if request.args.get("format") == "zip" else "pdf"
+    if not ids:
+        flash("Не выбраны заявки для печати меток", "warning")
+        return redirect(url_for("requests_list"))
+    
+    response, error = make_api_request('POST', '/qr/labels', json={"request_ids": ids, "format": fmt},
+                                       headers=api_headers())
+    if error is None and response:
+        return send_file(io.BytesIO(response.content),
+                         mimetype=response.headers.get("content-type"),
+                         as_attachment=True,
+                         download_name=f"qr-labels.{fmt}")
+    flash(error or "Ошибка формирования QR-меток", "danger")
+    return redirect(request.referrer or url_for("requests_list"))
+
+@app.route("/requests/export")
+@login_required
+@role_required("Менеджер", "Менеджер по качеству")
+def requests_export():
+    """Скачать выгрузку заявок: ответ бэкенда передаётся браузеру потоком"""
+    params = {k: v for k, v in request.args.items() if v and k != "cursor"}
+    params["format"] = "ndjson" if params.get("format") == "ndjson" else "csv"
+    
+    client = get_http_client()
+    try:
+        upstream = client.send(
+            client.build_request('GET', f"{API_URL}/requests/export", params=params, headers=api_headers()),
+            stream=True
+        )
+    except httpx.HTTPError as e:
+        logger.error(f"Export error: {e}")
+        flash(f"Ошибка подключения к серверу: {str(e)}", "danger")
+        return redirect(request.referrer or url_for("requests_list"))
+    
+    if upstream.status_code != 200:
+        upstream.read()
+        upstream.close()
+        try:
+            error = upstream.json().get("detail", "Неизвестная ошибка")
+        except ValueError:
+            error = f"Ошибка {upstream.status_code}"
+        if upstream.status_code == 401:
+            session.clear()
+        flash(f"Ошибка выгрузки: {error}", "danger")
+        return redirect(request.referrer or url_for("requests_list"))
+    
+    def generate():
+        try:
+            yield from upstream.iter_bytes()
+        finally:
+            upstream.close()
+    
+    return Response(generate(), mimetype=upstream.headers.get("content-type"),
+                    headers={"Content-Disposition": upstream.headers.get("content-disposition", "attachment")})
+
 @app.route("/requests/new", methods=["GET", "POST"])
 @login_required
 @role_required("Оператор", "Специалист", "Менеджер")
@@ -358,21 +637,20 @@ def new_request():
 @login_required
 @role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
 def request_detail(request_id):
-    response, error = make_api_request('GET', f'/requests/{request_id}', headers=api_headers())
+    # Заявка, клиент, специалист и страница комментариев с авторами — одним запросом
+    params = {'expand': 'client,master,comments'}
+    if request.args.get('comments_cursor'):
+        params['comments_cursor'] = request.args['comments_cursor']
+    response, error = make_api_request('GET', f'/requests/{request_id}', params=params, headers=api_headers())
     
     if error is None and response:
         request_data = response.json()
-        
-        comments_response, comments_error = make_api_request('GET', '/comments/', headers=api_headers())
-        if comments_error is None and comments_response:
-            all_comments = comments_response.json()
-            request_comments = [c for c in all_comments if c.get('request_id') == request_id]
-        else:
-            request_comments = []
-        
+        next_cursor = request_data.get("comments_next_cursor")
         return render_template("requests/detail.html", 
                              r=request_data, 
-                             comments=request_comments,
+                             comments=request_data.get("comments") or [],
+                             comments_next_url=url_for("request_detail", request_id=request_id,
+                                                       comments_cursor=next_cursor) if next_cursor else None,
                              role=session.get("role"),
                              title=f"Заявка #{request_id}")
     else:
@@ -403,6 +681,33 @@ def edit_request(request_id):
     
     return redirect(url_for("request_detail", request_id=request_id))
 
+@app.route("/requests/bulk-update", methods=["POST"])
+@login_required
+@role_required("Менеджер", "Менеджер по качеству")
+def bulk_update_requests():
+    ids = [int(i) for i in request.form.getlist("request_ids") if i.isdigit()]
+    patch = {k: request.form[k] for k in ("request_status", "completion_date") if request.form.get(k)}
+    if request.form.get("master_id"):
+        patch["master_id"] = int(request.form["master_id"])
+    
+    if not ids:
+        flash("Отметьте заявки в списке", "warning")
+    elif not patch:
+        flash("Укажите статус, специалиста или дату завершения", "warning")
+    else:
+        response, error = make_api_request('POST', '/requests/bulk-update',
+                                           json={"request_ids": ids, "patch": patch}, headers=api_headers())
+        if error is None and response:
+            result = response.json()
+            flash(f"Обновлено заявок: {result['updated']}", "success")
+            if result["failed"]:
+                missing = ", ".join(f"#{r['request_id']}" for r in result["results"] if not r["ok"])
+                flash(f"Не найдены заявки: {missing}", "warning")
+        else:
+            flash(error or "Ошибка массового обновления", "danger")
+    
+    return redirect(request.referrer or url_for("requests_list"))
+
 @app.route("/requests/<int:request_id>/assign", methods=["POST"])
 @login_required
 @role_required("Менеджер", "Менеджер по качеству")
@@ -457,16 +762,20 @@ def delete_request(request_id):
 @login_required
 @role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
 def comments_list():
-    response, error = make_api_request('GET', '/comments/', headers=api_headers())
+    params = {k: v for k, v in request.args.items() if v}
+    response, error = cached_api_request('/comments/', params=params)
     
+    next_url = None
     if error is None and response:
         comments = response.json()
+        next_url = next_page_url(response, "comments_list")
     else:
         comments = []
         flash(error or "Ошибка загрузки комментариев", "danger")
     
     return render_template("comments/list.html", 
                          comments=comments, 
+                         next_url=next_url,
                          role=session.get("role"),
                          title="Комментарии")
 
@@ -496,10 +805,21 @@ def new_comment():
 @app.route("/qr/feedback.png")
 @login_required
 def qr_feedback():
+    headers = api_headers()
+    # Браузер перепроверяет картинку по ETag бэкенда, ответ 304 отдаём как есть
+    if request.headers.get("If-None-Match"):
+        headers["If-None-Match"] = request.headers["If-None-Match"]
+    params = {k: request.args[k] for k in ("size", "ec", "format") if k in request.args}
     try:
-        response = http.get(f"{API_URL}/qr/feedback", headers=api_headers())
-        if response.status_code == 200:
-            return send_file(io.BytesIO(response.content), mimetype="image/png")
+        response = send_api_request('GET', f"{API_URL}/qr/feedback", params=params, headers=headers)
+        if response.status_code in (200, 304):
+            proxied = app.response_class(response.content if response.status_code == 200 else b"",
+                                         status=response.status_code,
+                                         mimetype=response.headers.get("content-type", "image/png"))
+            for name in ("ETag", "Cache-Control"):
+                if name in response.headers:
+                    proxied.headers[name] = response.headers[name]
+            return proxied
     except Exception as e:
         logger.error(f"QR generation error: {e}")
     
@@ -526,21 +846,11 @@ def statistics():
                              role=session.get("role"),
                              title="Статистика")
     
-    stats_data = {}
-    
-    endpoints = {
-        'count': '/requests/stats/count',
-        'avg_time': '/requests/stats/avg-time',
-        'by_tech': '/requests/stats/by-tech',
-        'by_problem': '/requests/stats/by-problem-type'
-    }
-    
-    for key, endpoint in endpoints.items():
-        response, error = make_api_request('GET', endpoint, headers=api_headers())
-        if error is None and response:
-            stats_data[key] = response.json()
-        else:
-            stats_data[key] = None if key == 'avg_time' else []
+    response, error = cached_api_request('/requests/stats/summary')
+    if error is None and response:
+        stats_data = response.json()
+    else:
+        stats_data = {'count': None, 'avg_time': None, 'by_tech': [], 'by_problem': []}
     
     return render_template("statistics.html",
                          stats=stats_data,
@@ -557,10 +867,13 @@ def my_requests():
         return redirect(url_for("index"))
     
     params = {k: v for k, v in request.args.items() if v}
-    response, error = make_api_request('GET', '/client/my-requests', params=params, headers=api_headers())
+    response, error = cached_api_request('/client/my-requests', params=params)
     
+    next_url = None
     if error is None and response:
         requests_data = response.json()
+        filters = {k: v for k, v in params.items() if k != "cursor"}
+        next_url = next_page_url(response, "my_requests", **filters)
     else:
         requests_data = []
         if error:
@@ -568,6 +881,7 @@ def my_requests():
     
     return render_template("client/my_requests.html", 
                          requests=requests_data, 
+                         next_url=next_url,
                          role=session.get("role"),
                          title="Мои заявки")
 
@@ -646,26 +960,45 @@ def my_request_detail(request_id):
         flash("Эта страница только для заказчиков", "warning")
         return redirect(url_for("index"))
     
-    response, error = make_api_request('GET', f'/client/my-requests/{request_id}', headers=api_headers())
+    # Заявка, специалист и страница комментариев с авторами — одним запросом
+    params = {'expand': 'master,comments'}
+    if request.args.get('comments_cursor'):
+        params['comments_cursor'] = request.args['comments_cursor']
+    response, error = make_api_request('GET', f'/requests/{request_id}', params=params, headers=api_headers())
     
     if error is None and response:
         request_data = response.json()
-        
-        comments_response, comments_error = make_api_request('GET', f'/client/my-requests/{request_id}/comments', headers=api_headers())
-        if comments_error is None and comments_response:
-            request_comments = comments_response.json()
-        else:
-            request_comments = []
-        
+        next_cursor = request_data.get("comments_next_cursor")
         return render_template("client/request_detail.html", 
                              r=request_data, 
-                             comments=request_comments,
+                             comments=request_data.get("comments") or [],
+                             comments_next_url=url_for("my_request_detail", request_id=request_id,
+                                                       comments_cursor=next_cursor) if next_cursor else None,
                              role=session.get("role"),
                              title=f"Моя заявка #{request_id}")
     else:
         flash(error or "Заявка не найдена", "danger")
         return redirect(url_for("my_requests"))
 
+@app.route("/internal/cache")
+@login_required
+@role_required("Менеджер")
+def cache_stats():
+    """Статистика кэшей ответов API в этом процессе"""
+    return jsonify({
+        "responses": response_cache.stats(),
+        "validators": {"revalidated": validator_cache.revalidated},
+    })
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Метрики для Prometheus: без авторизации, закрывайте доступ снаружи на прокси"""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('errors/404.html', title="Страница не найдена"), 404
@@ -0,0 +1,51 @@
+from sqlalchemy import text
+
+from backend import database
+from conftest import add_user, auth_headers
+
+def item(client_id: int, **fields) -> dict:
+    values = {"start_date": "2024-01-01", "climate_tech_type": "Кондиционер", "climate_tech_model": "TCL",
+              "problem_description": "Не охлаждает", "request_status": "Новая заявка", "client_id": client_id}
+    values.update(fields)
+    return values
+
+def test_bulk_create_reports_values_columns_reject(client, db):
+    add_user(db, "Менеджер", "manager")
+    customer = add_user(db, "Заказчик", "customer")
+    items = [
+        item(customer.user_id),
+        item(customer.user_id, climate_tech_type="К" * 101),
+        item(customer.user_id, request_status="С" * 51),
+        item(2**31),
+    ]
+
+    r = client.post("/requests/bulk", json=items, headers=auth_headers(client, "manager"))
+
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["created"], body["failed"]) == (1, 3)
+    assert [result["ok"] for result in body["results"]] == [True, False, False, False]
+    assert body["results"][1]["errors"] == ["climate_tech_type: не длиннее 100 символов"]
+    assert body["results"][2]["errors"] == ["request_status: не длиннее 50 символов"]
+
+def test_bulk_create_falls_back_to_single_inserts(client, db):
+    add_user(db, "Менеджер", "manager")
+    customer = add_user(db, "Заказчик", "customer")
+    # Ограничение, о котором пред-проверка не знает: пачку отвергает сама БД
+    with database.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE climate_service.requests ADD CONSTRAINT test_model_check "
+                          "CHECK (climate_tech_model <> 'Брак') NOT VALID"))
+    try:
+        items = [item(customer.user_id), item(customer.user_id, climate_tech_model="Брак"), item(customer.user_id)]
+        r = client.post("/requests/bulk", json=items, headers=auth_headers(client, "manager"))
+    finally:
+        with database.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE climate_service.requests DROP CONSTRAINT test_model_check"))
+
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [result["ok"] for result in body["results"]] == [True, False, True]
+    assert "test_model_check" in body["results"][1]["errors"][0]
+    summary = client.get("/requests/stats/summary", headers=auth_headers(client, "manager")).json()
+    assert summary["count"]["total_requests"] == 2
@@ -0,0 +1,26 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.auth import Principal, get_current_user
+from backend.database import get_db
+from backend.routers import requests
+
+@pytest.fixture
+def api():
+    """Только маршруты заявок, под менеджером и без БД: проверки до обращения к ней"""
+    app = FastAPI()
+    app.include_router(requests.router, prefix="/requests")
+    app.dependency_overrides[get_current_user] = lambda: Principal(1, "Менеджер", "Тестов")
+    app.dependency_overrides[get_db] = lambda: None
+    return TestClient(app)
+
+@pytest.mark.parametrize("filter", [{}, {"status": None, "master_id": None}])
+def test_empty_filter_is_rejected(api, filter):
+    r = api.post("/requests/bulk-update", json={"filter": filter, "patch": {"request_status": "Готова к выдаче"}})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Фильтр пуст: укажите хотя бы одно условие"
+
+def test_missing_target_is_rejected(api):
+    r = api.post("/requests/bulk-update", json={"patch": {"request_status": "Готова к выдаче"}})
+    assert r.status_code == 400
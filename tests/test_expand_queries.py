@@ -0,0 +1,51 @@
+import pytest
+
+from backend import models, querystats
+from conftest import add_request, add_user, auth_headers
+
+EXPAND = "client,master,comments"
+
+@pytest.fixture
+def count_queries(client, monkeypatch):
+    """Число SQL-запросов HTTP-запроса по счётчику querystats (заголовок X-DB-Queries)"""
+    monkeypatch.setattr(querystats, "QUERY_HEADERS", True)
+
+    def count(url, headers):
+        client.get(url, headers=headers)  # пользователь из токена попадает в кэш
+        r = client.get(url, headers=headers)
+        assert r.status_code == 200, r.text
+        return int(r.headers["X-DB-Queries"]), r.json()
+    return count
+
+def add_requests(db, count: int, comments: int):
+    customer = add_user(db, "Заказчик", f"customer{count}-{comments}")
+    master = add_user(db, "Специалист", f"master{count}-{comments}")
+    requests = [add_request(db, customer.user_id, master_id=master.user_id) for _ in range(count)]
+    for request in requests:
+        db.add_all(models.Comment(message=f"Комментарий {i}", master_id=master.user_id,
+                                  request_id=request.request_id) for i in range(comments))
+    db.commit()
+    return requests
+
+@pytest.mark.parametrize("comments", [1, 5, 45])
+def test_expanded_detail_is_two_queries(client, db, count_queries, comments):
+    add_user(db, "Менеджер", "manager")
+    request, = add_requests(db, 1, comments)
+
+    queries, body = count_queries(f"/requests/{request.request_id}?expand={EXPAND}",
+                                  auth_headers(client, "manager"))
+
+    assert queries == 2
+    assert len(body["comments"]) == min(comments, 20)
+    assert body["client"] and body["master"] and body["comments"][0]["master"]
+
+@pytest.mark.parametrize("rows, comments", [(1, 1), (10, 3), (40, 25)])
+def test_expanded_list_is_two_queries(client, db, count_queries, rows, comments):
+    add_user(db, "Менеджер", "manager")
+    add_requests(db, rows, comments)
+
+    queries, body = count_queries(f"/requests/?expand={EXPAND}&limit=50", auth_headers(client, "manager"))
+
+    assert queries == 2
+    assert len(body) == rows
+    assert all(len(row["comments"]) == min(comments, 20) for row in body)
@@ -0,0 +1,31 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import StaticPool
+
+from backend import querystats
+
+@pytest.fixture
+def engine():
+    # Одно соединение на все запросы, как соединение, повторно выданное пулом
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    querystats.install(engine)
+    yield engine
+    engine.dispose()
+
+def test_failed_statement_does_not_skew_next_timing(engine):
+    stats, token = querystats.start("test")
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(exc.OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+            time.sleep(0.2)
+            conn.execute(text("SELECT 1"))
+            assert "query_started" not in conn.info
+    finally:
+        querystats.finish(token)
+
+    # Учтён только успешный запрос, и его время не включает паузу после ошибки
+    assert stats.count == 1
+    assert stats.duration < 0.1
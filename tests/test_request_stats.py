@@ -0,0 +1,74 @@
+import threading
+import time
+from datetime import date
+
+from backend import crud, database, schemas, stats
+from conftest import add_request, add_user
+
+def rebuilt_summary(db, client_id: int):
+    """Статистика, пересчитанная с нуля по таблице заявок (без сохранения)"""
+    stats.rebuild(db)
+    summary = stats.get_summary(db, client_id)
+    db.rollback()
+    return summary
+
+def assert_rollup_matches(db, client_id: int):
+    for scope in (stats.ALL_CLIENTS, client_id):
+        db.rollback()
+        actual = stats.get_summary(db, scope)
+        assert actual == rebuilt_summary(db, scope)
+
+def run_concurrently(fn, *calls):
+    """
+    Выполнить fn(session, *args) для каждого набора args в своём потоке и
+    своей сессии, пока строка заявки заблокирована третьей транзакцией:
+    все вызовы успевают начаться до того, как первый из них сможет её изменить.
+    """
+    request_id = calls[0][0]
+    holder = database.SessionLocal()
+    crud.lock_request(holder, request_id)
+    results = [None] * len(calls)
+
+    def worker(n, args):
+        session = database.SessionLocal()
+        try:
+            results[n] = fn(session, *args) is not None
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker, args=(n, args)) for n, args in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    holder.commit()
+    holder.close()
+    for thread in threads:
+        thread.join(timeout=30)
+    return results
+
+def test_concurrent_updates_keep_stats_consistent(db):
+    client = add_user(db, "Заказчик", "client")
+    other = add_user(db, "Заказчик", "other")
+    add_request(db, client.user_id, climate_tech_type="Увлажнитель воздуха")
+    request = add_request(db, client.user_id)
+
+    results = run_concurrently(
+        crud.update_request,
+        (request.request_id, schemas.RequestUpdate(completion_date=date(2024, 1, 5))),
+        (request.request_id, schemas.RequestUpdate(client_id=other.user_id)),
+    )
+
+    assert results == [True, True]
+    assert_rollup_matches(db, client.user_id)
+    assert_rollup_matches(db, other.user_id)
+
+def test_concurrent_deletes_keep_stats_consistent(db):
+    client = add_user(db, "Заказчик", "client")
+    add_request(db, client.user_id, climate_tech_type="Увлажнитель воздуха")
+    request = add_request(db, client.user_id, completion_date=date(2024, 1, 3))
+
+    results = run_concurrently(crud.delete_request, (request.request_id,), (request.request_id,))
+
+    # Вторая транзакция дождалась первой и заявку уже не нашла
+    assert sorted(results) == [False, True]
+    assert_rollup_matches(db, client.user_id)